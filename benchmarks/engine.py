@@ -0,0 +1,207 @@
+'''Engine benchmarks: hot paths on generated game states of several map sizes
+and unit densities, full games, how turns scale with the size of generated
+maps, and with the area of lane maps at a fixed unit count. Results are written as json, one document per run, to be
+compared across commits:
+
+    python benchmarks/engine.py --output results.json
+'''
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mobai.engine.game import GameState  # noqa: E402
+from mobai.engine.topology import LANES, Topology  # noqa: E402
+from mobai.engine.util import a_star_search  # noqa: E402
+from mobai.tournament.bots import BOTS  # noqa: E402
+
+MAP_SIZES = ((8, 5), (22, 13), (36, 21))
+# name: (spawn interval, turns played), denser states spawn more often and play longer
+DENSITIES = {'early': (10, 10), 'mid': (10, 100), 'late': (3, 200)}
+FULL_GAMES = (('rusher', 'idle'), ('rusher', 'defender'))
+# generated maps of growing area, played for SCALING_TURNS turns
+SCALING_SIZES = ((60, 31), (120, 61), (240, 121), (480, 241))
+SCALING_TURNS = 30
+# lane maps of growing area without spawning, the same units played for AREA_TURNS turns
+AREA_SIZES = ((36, 21), (78, 45), (148, 85), (288, 165))
+AREA_TURNS = 5
+
+
+def measure(fn, setup=None, min_time=0.2, min_runs=5):
+    '''per call timings of fn(setup()) in microseconds, setup isn't timed'''
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_runs or time.perf_counter() - started < min_time:
+        args = (setup(),) if setup is not None else ()
+        call_started = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - call_started) * 1e6)
+    timings.sort()
+    return dict(runs=len(timings), mean_us=sum(timings) / len(timings), median_us=timings[len(timings) // 2],
+                min_us=timings[0])
+
+
+def play(gamestate, bots, turns):
+    '''advance gamestate by turns with bots (player0, player1), stops if finished'''
+    for _ in range(turns):
+        for player, bot in zip((gamestate.player0, gamestate.player1), bots):
+            gamestate.commands_from_player(player, bot(gamestate.state_for_player(player, sparse=True)))
+        gamestate.evaluate_turn()
+        if gamestate.finished:
+            return False
+        gamestate.begin_turn()
+    return True
+
+
+def generate_state(map_size, density, gamestate_options):
+    '''a game played by defenders, soldiers pile up at home and meet in the middle'''
+    spawn_interval, turns = DENSITIES[density]
+    gamestate = GameState(map_size=map_size, **gamestate_options)
+    gamestate.spawn_interval = spawn_interval
+    gamestate.begin_turn()
+    play(gamestate, (BOTS['defender'], BOTS['rusher']), turns)
+    return gamestate
+
+
+def state_benchmarks(gamestate, min_time):
+    game_map, player = gamestate.map, gamestate.player0
+    forts = [(x, y) for x, y in game_map.fort_positions]
+    start, end = forts[0], forts[-1]
+    commands = BOTS['rusher'](gamestate.state_for_player(player))
+    serialized = GameState.serialize(gamestate, binary=True)
+    pickled = GameState.serialize(gamestate, binary=False)
+    return {
+        'vision_by_player': measure(lambda: game_map.vision_by_player(player), min_time=min_time),
+        'a_star_search': measure(lambda: list(a_star_search(game_map, start, end)), min_time=min_time),
+        'shortest_path': measure(lambda: game_map.shortest_path(start, end), min_time=min_time),
+        # on a fresh fork per call, commands already applied are cheaper to validate again
+        'commands_from_player': measure(lambda gs: gs.commands_from_player(gs.player0, commands),
+                                        setup=gamestate.fork, min_time=min_time),
+        'evaluate_turn': measure(lambda gs: gs.evaluate_turn(), setup=gamestate.fork, min_time=min_time),
+        'to_array': measure(lambda: game_map.to_array(by_player=player), min_time=min_time),
+        'to_array_sparse': measure(lambda: game_map.to_array(by_player=player, sparse=True), min_time=min_time),
+        'serialize': measure(lambda: GameState.serialize(gamestate, binary=True), min_time=min_time),
+        'deserialize': measure(lambda: GameState.deserialize(serialized), min_time=min_time),
+        'serialize_pickle': measure(lambda: GameState.serialize(gamestate, binary=False), min_time=min_time),
+        'deserialize_pickle': measure(lambda: GameState.deserialize(pickled), min_time=min_time),
+    }
+
+
+def full_game(map_size, bots, max_turns, gamestate_options):
+    gamestate = GameState(map_size=map_size, **gamestate_options)
+    gamestate.begin_turn()
+    started = time.perf_counter()
+    play(gamestate, [BOTS[name] for name in bots], max_turns)
+    seconds = time.perf_counter() - started
+    winner = gamestate.winner
+    return dict(bots=list(bots), map_size=list(map_size), turns=gamestate.turn, seconds=seconds,
+                turns_per_second=gamestate.turn / seconds, winner=winner.id if winner else None)
+
+
+def scaling(map_size, min_time, gamestate_options, seed=0):
+    '''a generated map, built and played by rushers for SCALING_TURNS turns'''
+    started = time.perf_counter()
+    topology = Topology.generate(*map_size, seed=seed)
+    gamestate = GameState(topology=topology, **gamestate_options)
+    build_seconds = time.perf_counter() - started
+    gamestate.begin_turn()
+    play(gamestate, (BOTS['rusher'], BOTS['rusher']), SCALING_TURNS)
+    player = gamestate.player0
+    return dict(
+        map_size=list(map_size), positions=len(topology.positions), buildings=len(topology.building_positions),
+        units=len(gamestate.all_units), build_seconds=build_seconds, benchmarks={
+            'vision_by_player': measure(lambda: gamestate.map.vision_by_player(player), min_time=min_time),
+            'evaluate_turn': measure(lambda gs: gs.evaluate_turn(), setup=gamestate.fork, min_time=min_time),
+            'to_array': measure(lambda: gamestate.map.to_array(by_player=player), min_time=min_time),
+            'to_array_sparse': measure(lambda: gamestate.map.to_array(by_player=player, sparse=True),
+                                       min_time=min_time),
+        },
+    )
+
+
+def area(map_size, min_time, gamestate_options):
+    '''a lane map without spawning, the starting units played by rushers for
+    AREA_TURNS turns: what grows with the map and not with the units
+    '''
+    gamestate = GameState(topology=Topology.build(LANES, *map_size), **gamestate_options)
+    gamestate.spawn_interval = sys.maxsize  # only the first spawn
+    gamestate.begin_turn()
+    play(gamestate, (BOTS['rusher'], BOTS['rusher']), AREA_TURNS)
+    player = gamestate.player0
+    return dict(
+        map_size=list(map_size), positions=len(gamestate.map.topology.positions), units=len(gamestate.all_units),
+        visible=len(gamestate.map.vision.visible(player)), benchmarks={
+            'evaluate_turn': measure(lambda gs: gs.evaluate_turn(), setup=gamestate.fork, min_time=min_time),
+            'fork': measure(gamestate.fork, min_time=min_time),
+            'to_array': measure(lambda: gamestate.map.to_array(by_player=player), min_time=min_time),
+            'to_array_sparse': measure(lambda: gamestate.map.to_array(by_player=player, sparse=True),
+                                       min_time=min_time),
+        },
+    )
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(map_sizes=MAP_SIZES, densities=tuple(DENSITIES), min_time=0.2, max_turns=500,
+                   gamestate_options=None, scaling_sizes=SCALING_SIZES, area_sizes=AREA_SIZES):
+    gamestate_options = gamestate_options or {}
+    results = dict(
+        commit=git_commit(), python=platform.python_version(), platform=platform.platform(),
+        gamestate_options=gamestate_options, states=[], games=[], scaling=[], area=[],
+    )
+    for map_size in map_sizes:
+        for density in densities:
+            gamestate = generate_state(map_size, density, gamestate_options)
+            results['states'].append(dict(
+                map_size=list(map_size), density=density, turn=gamestate.turn, units=len(gamestate.all_units),
+                benchmarks=state_benchmarks(gamestate, min_time),
+            ))
+        for bots in FULL_GAMES:
+            results['games'].append(full_game(map_size, bots, max_turns, gamestate_options))
+    for map_size in scaling_sizes:
+        results['scaling'].append(scaling(map_size, min_time, gamestate_options))
+    for map_size in area_sizes:
+        results['area'].append(area(map_size, min_time, gamestate_options))
+    return results
+
+
+@click.command()
+@click.option('--map-size', 'map_sizes', multiple=True, help='XxY, repeatable, defaults to all of MAP_SIZES')
+@click.option('--density', 'densities', multiple=True, type=click.Choice(sorted(DENSITIES)))
+@click.option('--min-time', default=0.2, help='seconds per benchmark')
+@click.option('--max-turns', default=500, help='of full games')
+@click.option('--scaling-size', 'scaling_sizes', multiple=True,
+              help='XxY of generated maps, repeatable, defaults to all of SCALING_SIZES, `none` to skip')
+@click.option('--area-size', 'area_sizes', multiple=True,
+              help='XxY of lane maps, repeatable, defaults to all of AREA_SIZES, `none` to skip')
+@click.option('--unit-store', is_flag=True)
+@click.option('--vectorized', is_flag=True)
+@click.option('--output', default='-', type=click.File('w'))
+def main(map_sizes, densities, min_time, max_turns, scaling_sizes, area_sizes, unit_store, vectorized, output):
+    map_sizes = [tuple(int(v) for v in size.split('x')) for size in map_sizes] or MAP_SIZES
+    scaling_sizes = [tuple(int(v) for v in size.split('x')) for size in scaling_sizes if size != 'none'] \
+        if scaling_sizes else SCALING_SIZES
+    area_sizes = [tuple(int(v) for v in size.split('x')) for size in area_sizes if size != 'none'] \
+        if area_sizes else AREA_SIZES
+    results = run_benchmarks(
+        map_sizes=map_sizes, densities=densities or tuple(DENSITIES), min_time=min_time, max_turns=max_turns,
+        gamestate_options=dict(unit_store=unit_store, vectorized=vectorized), scaling_sizes=scaling_sizes,
+        area_sizes=area_sizes,
+    )
+    json.dump(results, output, indent=2)
+    output.write('\n')
+
+if __name__ == '__main__':
+    main()
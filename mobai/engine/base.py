@@ -1,7 +1,15 @@
 class IDComparable(object):
-    '''equality and uniqueness by id property'''
+    '''equality and uniqueness by id property, among objects of the same
+    `id_kind` (players and units both have integer ids)
+    '''
+    __slots__ = ()
+    id_kind = None
+
     def __eq__(self, other):
-        return self.id == other.id
+        # not equal to anything else, eg. None or a GameTile target
+        if not isinstance(other, IDComparable):
+            return False
+        return self.id == other.id and self.id_kind == other.id_kind
 
     def __ne__(self, other):
         return not self.__eq__(other)
@@ -11,6 +19,9 @@ class IDComparable(object):
 
 
 class Player(IDComparable):
+    __slots__ = ('id',)
+    id_kind = 'player'
+
     def __init__(self, id):
         self.id = id
 
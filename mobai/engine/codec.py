@@ -0,0 +1,144 @@
+'''Versioned binary encoding of a GameState.
+
+Layout (little-endian), version 1:
+
+    header:  magic `MOBAI`, version (B)
+    game:    size_x, size_y (H), turn, spawn_interval (I), last_unit_id (i),
+             flags (B, 1: unit store, 2: vectorized), unit count (I),
+             topology kind (B), seed (I), spacing (H)
+    units:   zlib compressed, one fixed size record per unit in map grid and
+             occupant order, see `UNIT_RECORD`
+
+Only the state that can't be derived from the topology is stored, tiles,
+buildings positions, vision and routing are rebuilt while decoding, so games
+on a CUSTOM topology (see `Topology`) aren't encoded, they are pickled.
+'''
+import struct
+import zlib
+
+from .routing import Path
+from .store import UNIT_TYPES
+from .topology import Topology
+from .unit import Fort, Soldier, Tower, UnitBase
+
+MAGIC = b'MOBAI'
+VERSION = 1
+
+HEADER = struct.Struct('<5sB')
+GAME = struct.Struct('<HHIIiBIBIH')
+# id, type, player, x, y, health, action points, vision, hit, attack,
+# target kind (0: none, 1: unit, 2: tile), target unit id or tile x, tile y,
+# path (0: none, 1: path), path position x, y, path end x, y
+UNIT_RECORD = struct.Struct('<iBBHHiiBBhBiHBHHHH')
+
+UNIT_CLASSES = {'Fort': Fort, 'Tower': Tower, 'Soldier': Soldier}
+FLAG_UNIT_STORE, FLAG_VECTORIZED = 1, 2
+TARGET_NONE, TARGET_UNIT, TARGET_TILE = 0, 1, 2
+
+
+def is_encoded(data):
+    return data[:len(MAGIC)] == MAGIC
+
+
+def unpack(data):
+    '''packed `GAME` and the concatenated unit records of data, raises
+    ValueError for anything but an encoding of this version
+    '''
+    if len(data) < HEADER.size + GAME.size:
+        raise ValueError('not an encoded game state')
+    magic, version = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not an encoded game state')
+    if version != VERSION:
+        raise ValueError('unsupported game state encoding version %d' % version)
+    offset = HEADER.size + GAME.size
+    try:
+        records = zlib.decompress(data[offset:])
+    except zlib.error:
+        raise ValueError('corrupt game state unit records')
+    return data[HEADER.size:offset], records
+
+
+def pack(game, records):
+    '''encoding of a packed `GAME` and concatenated unit records, see `unpack`'''
+    return b''.join([HEADER.pack(MAGIC, VERSION), game, zlib.compress(records, 1)])
+
+
+def encode(gamestate):
+    return pack(*encode_parts(gamestate))
+
+
+def encode_parts(gamestate):
+    '''packed `GAME` and the concatenated unit records of gamestate, see `pack`'''
+    game_map = gamestate.map
+    topology = game_map.topology
+    if not topology.rebuildable():
+        raise ValueError('topology %r is not built again from its key' % (topology.key,))
+    units = game_map.get_all_units()
+    flags = (FLAG_UNIT_STORE if game_map.units is not None else 0) | (FLAG_VECTORIZED if gamestate.vectorized else 0)
+    game = GAME.pack(
+        game_map.size_x, game_map.size_y, gamestate.turn, gamestate.spawn_interval, game_map.last_unit_id,
+        flags, len(units), topology.kind, topology.seed, topology.spacing,
+    )
+    records = []
+    pack_record = UNIT_RECORD.pack
+    for unit in units:
+        target = unit.target
+        if target is None:
+            target_record = (TARGET_NONE, 0, 0)
+        elif isinstance(target, UnitBase):
+            target_record = (TARGET_UNIT, target.id, 0)
+        else:
+            target_record = (TARGET_TILE, target.x, target.y)
+        path = getattr(unit, 'path', None)
+        if isinstance(path, Path):
+            path_record = (1, path.position[0], path.position[1], path.end[0], path.end[1])
+        else:
+            path_record = (0, 0, 0, 0, 0)
+        records.append(pack_record(
+            unit.id, UNIT_TYPES.index(unit.__class__.__name__), unit.player.id, unit.x, unit.y,
+            unit.health, unit.action_points, unit.vision, unit.hit, unit.attack,
+            *(target_record + path_record)
+        ))
+    return game, b''.join(records)
+
+
+def decode(data, gamestate_class):
+    game, records = unpack(data)
+    (size_x, size_y, turn, spawn_interval, last_unit_id, flags, unit_count,
+     kind, seed, spacing) = GAME.unpack(game)
+
+    gamestate = gamestate_class(
+        unit_store=bool(flags & FLAG_UNIT_STORE), vectorized=bool(flags & FLAG_VECTORIZED), buildings=False,
+        topology=Topology.build(kind, size_x, size_y, seed=seed, spacing=spacing),
+    )
+    game_map = gamestate.map
+    game_map.last_unit_id = last_unit_id
+    gamestate.turn, gamestate.spawn_interval = turn, spawn_interval
+
+    # units are made off the map, then put on their tiles and indexed all at once
+    units, placed = {}, []
+    for record in UNIT_RECORD.iter_unpack(records[:unit_count * UNIT_RECORD.size]):
+        (unit_id, unit_type, player_id, x, y, health, action_points, vision, hit, attack,
+         target_kind, target_a, target_b, has_path, path_x, path_y, end_x, end_y) = record
+        unit = UNIT_CLASSES[UNIT_TYPES[unit_type]]._restore(
+            gamestate.players[player_id], unit_id, health, action_points, vision, hit, attack,
+        )
+        if has_path:
+            unit.path = Path(game_map, (path_x, path_y), (end_x, end_y))
+        units[unit_id] = unit
+        placed.append((unit, x, y, target_kind, target_a, target_b))
+
+    tiles = {}
+    for unit, x, y, target_kind, target_a, target_b in placed:
+        if target_kind == TARGET_UNIT:
+            unit.target = units[target_a]
+        elif target_kind == TARGET_TILE:
+            unit.target = game_map.get_tile(target_a, target_b)
+        tile = tiles.get((x, y))
+        if tile is None:
+            tile = tiles[(x, y)] = game_map.get_tile(x, y)
+        unit._tile = tile
+        tile.occupants.append(unit)
+    game_map.index_units(units.values())
+    return gamestate
@@ -0,0 +1,172 @@
+'''Columnar training data from game trajectories.
+
+A dataset is a directory of shards, each shard a directory of `.npy` column
+files that can be memory-mapped, plus `dataset.json` with the schema and
+shard list. Rows are buffered per game until it ends, as outcomes are only
+known then, and written out in shards of about `shard_size` observations.
+
+Observations, one row per player per turn:
+
+    game (i8), turn (i4), player (i1), planes (f4, see `planes`),
+    outcome (i1, 1 won, -1 lost, 0 draw or unfinished)
+
+Actions, one row per accepted command:
+
+    game (i8), turn (i4), player (i1), unit (i4), action (i1, `ActionType`),
+    target_kind (i1, 0 none, 1 unit, 2 tile), target_unit (i4),
+    target_x, target_y (i2), -1 where not applicable
+'''
+import json
+import os
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+from . import planes
+from .game import ActionType
+from .unit import parse_unit_id
+
+METADATA = 'dataset.json'
+OBSERVATION_COLUMNS = (('game', 'i8'), ('turn', 'i4'), ('player', 'i1'), ('planes', 'f4'), ('outcome', 'i1'))
+ACTION_COLUMNS = (
+    ('game', 'i8'), ('turn', 'i4'), ('player', 'i1'), ('unit', 'i4'), ('action', 'i1'),
+    ('target_kind', 'i1'), ('target_unit', 'i4'), ('target_x', 'i2'), ('target_y', 'i2'),
+)
+
+
+def action_row(game, turn, player_id, command):
+    '''an accepted command as an action row'''
+    target = command.get('target')
+    if target is None:
+        target_values = (0, -1, -1, -1)
+    elif isinstance(target, str):
+        target_values = (1, parse_unit_id(target), -1, -1)
+    else:
+        target_values = (2, -1, target['posx'], target['posy'])
+    return (game, turn, player_id, parse_unit_id(command['id']), ActionType[command['action']].value) + target_values
+
+
+class DatasetWriter(object):
+    '''Appends games to a dataset directory, which is created if missing:
+
+        game = writer.begin_game()
+        # every turn, after commands_from_player and before evaluate_turn
+        writer.add_turn(game, gs, actions0, actions1)
+        writer.end_game(game, gs)
+        writer.close()  # writes the last, partial shard
+    '''
+    def __init__(self, directory, shard_size=10000):
+        assert numpy is not None, 'datasets require numpy'
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, METADATA)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.metadata = json.load(f)
+        else:
+            self.metadata = dict(planes=list(planes.PLANES), plane_shape=None, shards=[], games=0)
+        self.games = {}  # game -> (observation rows, action rows) of running games
+        self.observations, self.actions = [], []  # rows of ended games
+
+    def begin_game(self):
+        game = self.metadata['games']
+        self.metadata['games'] += 1
+        self.games[game] = ([], [])
+        return game
+
+    def add_turn(self, game, gamestate, actions0, actions1):
+        observations, actions = self.games[game]
+        for player, player_actions in ((gamestate.player0, actions0), (gamestate.player1, actions1)):
+            observations.append((game, gamestate.turn, player.id, gamestate.map.to_planes(player)))
+            actions.extend(action_row(game, gamestate.turn, player.id, command) for command in player_actions)
+
+    def end_game(self, game, gamestate):
+        '''outcomes are set from the winner of gamestate, if any'''
+        observations, actions = self.games.pop(game)
+        winner = gamestate.winner if gamestate.finished else None
+        for row in observations:
+            outcome = 0 if not winner else (1 if winner.id == row[2] else -1)
+            self.observations.append(row + (outcome,))
+        self.actions.extend(actions)
+        if len(self.observations) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        '''write rows of ended games as a new shard'''
+        if not self.observations:
+            return
+        name = 'shard-%05d' % len(self.metadata['shards'])
+        path = os.path.join(self.directory, name)
+        os.makedirs(path)
+        plane_shape = list(self.observations[0][3].shape)
+        assert self.metadata['plane_shape'] in (None, plane_shape), 'map size differs from the dataset'
+        self.metadata['plane_shape'] = plane_shape
+
+        for prefix, columns, rows in (('observations', OBSERVATION_COLUMNS, self.observations),
+                                      ('actions', ACTION_COLUMNS, self.actions)):
+            for index, (column, dtype) in enumerate(columns):
+                if column == 'planes':
+                    values = numpy.stack([row[index] for row in rows]).astype(dtype)
+                else:
+                    values = numpy.array([row[index] for row in rows], dtype=dtype)
+                numpy.save(os.path.join(path, '%s.%s.npy' % (prefix, column)), values)
+        self.metadata['shards'].append(dict(name=name, observations=len(self.observations), actions=len(self.actions)))
+        self.observations, self.actions = [], []
+        self._save_metadata()
+
+    def _save_metadata(self):
+        path = os.path.join(self.directory, METADATA)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.metadata, f)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        '''flush ended games, games still running are dropped'''
+        self.flush()
+        self._save_metadata()
+
+
+class Dataset(object):
+    '''Reads a dataset with memory-mapped columns, eg.
+
+        for shard in Dataset(directory):
+            shard['observations']['planes'], shard['actions']['unit']
+    '''
+    def __init__(self, directory, mmap_mode='r'):
+        assert numpy is not None, 'datasets require numpy'
+        self.directory = directory
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(directory, METADATA)) as f:
+            self.metadata = json.load(f)
+
+    def __len__(self):
+        '''observation rows'''
+        return sum(shard['observations'] for shard in self.metadata['shards'])
+
+    def shard(self, index):
+        path = os.path.join(self.directory, self.metadata['shards'][index]['name'])
+        return {
+            prefix: {
+                column: numpy.load(os.path.join(path, '%s.%s.npy' % (prefix, column)), mmap_mode=self.mmap_mode)
+                for column, dtype in columns
+            }
+            for prefix, columns in (('observations', OBSERVATION_COLUMNS), ('actions', ACTION_COLUMNS))
+        }
+
+    def __iter__(self):
+        for index in range(len(self.metadata['shards'])):
+            yield self.shard(index)
+
+
+def export_replay(replay, writer):
+    '''add a replay (see `replay`) to a dataset, returns the dataset game number'''
+    game = writer.begin_game()
+    gamestate = replay.state(replay.first_turn)
+    for _ in range(replay.turns):
+        writer.add_turn(game, gamestate, *replay.actions(gamestate.turn))
+        replay.step(gamestate)
+    writer.end_game(game, gamestate)
+    return game
@@ -1,9 +1,16 @@
 import enum
 import gzip
 import pickle
+import time
 
+from . import codec
 from .base import Player
 from .map import Map
+from .routing import routing_table
+from .undo import UndoEntry
+from .unit import parse_unit_id
+from .vectorized import VectorizedTurn
+from .zobrist import Zobrist, mix
 
 
 class ActionType(enum.Enum):
@@ -12,15 +19,38 @@ class ActionType(enum.Enum):
     stop = 2
 
 
+class CommandError(enum.Enum):
+    '''why a command was rejected, sent back by name in `errors`'''
+    malformed = 0  # missing or invalid fields
+    unknown_unit = 1
+    not_owned = 2  # unit of the other player
+    unknown_target = 3
+    own_target = 4  # targeting a unit of the same player
+    not_mobile = 5  # tile target for a building
+    invalid_position = 6
+    no_vision = 7  # target isn't visible to the player
+
+
+class InvalidCommand(Exception):
+    def __init__(self, reason):
+        super(InvalidCommand, self).__init__(reason.name)
+        self.reason = reason
+
+
 class Command(object):
     '''a command received from a player
-    {'id': '<uuid>', 'action': '<action-type>.name', 'target': '<uuid>' | {'posx': X, 'posy': Y} }
+    {'id': '<unit-id>', 'action': '<action-type>.name', 'target': '<unit-id>' | {'posx': X, 'posy': Y} }
+
+    Malformed commands fail assertions while being created, `verify_*`
+    raise `InvalidCommand`.
     '''
     def __init__(self, player, command):
+        # an object, eg. not a list or null
+        assert isinstance(command, dict)
         # id present and not empty
         assert command.get('id') and isinstance(command['id'], str)
         # action present and valid
-        assert 'action' in command and command['action'] in ActionType.__members__
+        assert isinstance(command.get('action'), str) and command['action'] in ActionType.__members__
         if ActionType[command['action']] is ActionType.target:
             # target present and valid
             assert 'target' in command and command['target']
@@ -38,18 +68,33 @@ class Command(object):
 
     def verify_unit(self, units):
         '''check if id is correct and player owns unit'''
-        assert self.id in units and units[self.id].player == self.player
-        self.unit = units[self.id]
+        unit = units.get(parse_unit_id(self.id))
+        if unit is None:
+            raise InvalidCommand(CommandError.unknown_unit)
+        if unit.player != self.player:
+            raise InvalidCommand(CommandError.not_owned)
+        self.unit = unit
 
-    def verify_target(self, units, map):
-        '''make sure target is valid'''
+    def verify_target(self, units, map, visible=None):
+        '''make sure target is valid, `visible` are the positions visible to
+        the player if already at hand
+        '''
         if isinstance(self.target, str):  # targeting a unit
-            assert self.target in units and units[self.target].player != self.player
-            target = units[self.target]
-        elif isinstance(self.target, dict):  # targeting a tile (position)
-            assert self.unit.mobile
+            target = units.get(parse_unit_id(self.target))
+            if target is None:
+                raise InvalidCommand(CommandError.unknown_target)
+            if target.player == self.player:
+                raise InvalidCommand(CommandError.own_target)
+        else:  # targeting a tile (position)
+            if not self.unit.mobile:
+                raise InvalidCommand(CommandError.not_mobile)
+            if not map.is_valid_position(self.target['posx'], self.target['posy']):
+                raise InvalidCommand(CommandError.invalid_position)
             target = map.get_tile(self.target['posx'], self.target['posy'])
-        assert map.player_has_vision(self.player, target)
+        if visible is None:
+            visible = map.vision.visible(self.player)
+        if (target.x, target.y) not in visible:
+            raise InvalidCommand(CommandError.no_vision)
         self.target = target
 
     def execute(self):
@@ -63,6 +108,32 @@ class Command(object):
             raise Exception('Uhm?')
 
 
+class ValidationContext(object):
+    '''What commands of a turn are validated against: the units by id and
+    the positions visible to each player. Built once for all commands of a
+    turn, they don't change until `evaluate_turn` (see
+    `GameState.validation_context`).
+    '''
+    def __init__(self, gamestate):
+        self.all_units = gamestate.all_units
+        self.units = gamestate.map.registry.units
+        self.map = gamestate.map
+        self.visible = {
+            player_id: self.map.vision.visible(player) for player_id, player in gamestate.players.items()
+        }
+
+    def validate(self, player, command):
+        '''verified `Command`, raises `InvalidCommand`'''
+        try:
+            cmd = Command(player, command)
+        except AssertionError:
+            raise InvalidCommand(CommandError.malformed)
+        cmd.verify_unit(self.units)
+        if cmd.action is ActionType.target:
+            cmd.verify_target(self.units, self.map, self.visible[player.id])
+        return cmd
+
+
 class GameState(object):
     '''
         * creating a GameState object initializes a game with map, players,
@@ -72,86 +143,180 @@ class GameState(object):
         * State representation are sent to players and actions are retrieved
         * Actions are verified and applied to units
         * `evaluate_turn` runs through the steps of executing actions and finishes turn
+
+    `vectorized` resolves turns with `VectorizedTurn` (needs numpy) instead of
+    unit by unit, it implies `unit_store`. `map_size` is an `(x, y)` tuple of
+    the default lanes, `topology` any other layout (see `topology`), without
+    `buildings` the map starts empty, eg. to be filled by a decoder.
+
+    For search, `fork` branches off an independent copy of the game, and
+    `checkpoint`/`undo` revert the game to an earlier point (eg. applied
+    commands and `evaluate_turn`) without copying it.
+
+    `stats` is an optional `GameStats` the phases of the game are timed and
+    counted in, without it instrumentation is skipped.
     '''
-    def __init__(self):
+    def __init__(self, unit_store=False, vectorized=False, buildings=True, map_size=None, stats=None,
+                 topology=None):
         self.player0, self.player1 = Player(0), Player(1)
         self.players = {0: self.player0, 1: self.player1}
-        self.init_map()
+        self.vectorized = vectorized
+        self.init_map(unit_store=unit_store or vectorized, buildings=buildings, map_size=map_size,
+                      topology=topology)
         self.turn = 0
         self.spawn_interval = 10
         self._all_units = None
+        self._validation = None
+        self._undo_log = []
+        self.stats = None
+        if stats is not None:
+            self.set_stats(stats)
+
+    def set_stats(self, stats):
+        '''start (or with None, stop) instrumenting the game in stats'''
+        self.stats = self.map.vision.stats = stats
+
+    def _phase_start(self):
+        table = routing_table(self.map)
+        return time.perf_counter(), table.searches, table.nodes
+
+    def _phase_end(self, name, started):
+        table = routing_table(self.map)
+        started_at, searches, nodes = started
+        self.stats.add_time(name, time.perf_counter() - started_at)
+        self.stats.count('path_searches', table.searches - searches)
+        self.stats.count('path_nodes', table.nodes - nodes)
+
+    def fork(self):
+        '''independent copy of the game, cheaper than a serialize round trip'''
+        forked = object.__new__(GameState)
+        forked.player0, forked.player1, forked.players = self.player0, self.player1, self.players
+        forked.vectorized = self.vectorized
+        forked.map = self.map.fork()
+        forked.turn, forked.spawn_interval = self.turn, self.spawn_interval
+        forked._all_units = forked._validation = None
+        forked._undo_log = []
+        forked.stats = None
+        return forked
+
+    def checkpoint(self):
+        '''remember the current state, to be reverted by `undo`'''
+        self._undo_log.append(UndoEntry(self))
+
+    def undo(self):
+        '''revert to the last checkpoint'''
+        self._undo_log.pop().revert(self)
 
     @staticmethod
-    def serialize(gamestate):
+    def serialize(gamestate, binary=False):
+        '''gzipped pickle, or the versioned binary encoding (see `codec`)'''
+        if binary:
+            return codec.encode(gamestate)
         return gzip.compress(pickle.dumps(gamestate), compresslevel=1)
 
     @staticmethod
     def deserialize(serialized):
+        '''either of the `serialize` formats'''
+        if codec.is_encoded(serialized):
+            return codec.decode(serialized, GameState)
         return pickle.loads(gzip.decompress(serialized))
 
+    def _zobrist(self):
+        '''hashing starts at the first read, the map keeps it up to date from then on'''
+        if self.map.zobrist is None:
+            self.map.zobrist = self.map.vision.zobrist = Zobrist(self.map)
+        return self.map.zobrist
+
+    @property
+    def hash(self):
+        '''64-bit Zobrist hash of the turn and all units, O(1) after the first read'''
+        return self._zobrist().value ^ mix(self.turn)
+
+    def hash_for_player(self, player):
+        '''like `hash`, only covering units on positions player can see'''
+        return self._zobrist().visible.get(player.id, 0) ^ mix(self.turn << 1 | player.id)
+
     @property
     def all_units(self):
-        '''resetted at the end of turn and regenerated at first access of every turn'''
+        '''resetted at the end and the beginning of turn and regenerated at first access of every turn'''
         if self._all_units is None:
             self._all_units = self.map.get_all_units()
         return self._all_units
 
     @property
     def finished(self):
-        p0, p1 = 0, 0  # unit counts
-        for unit in self.all_units:
-            if p0 and p1:
-                return False
-            if unit.player == self.player0:
-                p0 += 1
-            else:
-                p1 += 1
-        return True
+        counts = self.map.registry.counts
+        return not (counts.get(self.player0.id) and counts.get(self.player1.id))
 
     @property
     def winner(self):
         if not self.finished:
             return None
-        if not self.all_units:
-            return False
-        return self.all_units[0].player
+        counts = self.map.registry.counts
+        for player in (self.player0, self.player1):
+            if counts.get(player.id):
+                return player
+        return False
 
-    def init_map(self):
+    def init_map(self, unit_store=False, buildings=True, map_size=None, topology=None):
         assert not hasattr(self, 'map') or self.map is None
-        self.map = Map(p0=self.player0, p1=self.player1)
+        kwargs = dict(unit_store=unit_store, topology=topology)
+        if buildings:
+            kwargs.update(p0=self.player0, p1=self.player1)
+        if map_size is not None:
+            kwargs.update(x=map_size[0], y=map_size[1])
+        self.map = Map(**kwargs)
 
     def begin_turn(self):
+        started = self._phase_start() if self.stats is not None else None
         if self.turn % self.spawn_interval == 0:
             self._spawn_new_units()
+        self._all_units = None  # eg. read since `evaluate_turn`, before spawning
         assert not self.finished, 'Game is finished'
         for unit in self.all_units:
             unit.action_points = 1
+        if started is not None:
+            self._phase_end('begin_turn', started)
 
-    def state_for_player(self, player):
+    def state_for_player(self, player, sparse=False):
+        '''what player sees, the visible tiles as `map[y][x]` or with `sparse`
+        as a list of `tiles` (see `Map.to_array`)
+        '''
+        if sparse:
+            return dict(player_id=player.id, turn=self.turn, tiles=self.map.to_array(by_player=player, sparse=True))
         return dict(
             player_id=player.id, turn=self.turn,
             map=self.map.to_array(by_player=player),
         )
 
+    def validation_context(self):
+        '''`ValidationContext` of the turn, rebuilt along with `all_units`'''
+        if self._validation is None or self._validation.all_units is not self.all_units:
+            self._validation = ValidationContext(self)
+        return self._validation
+
     def commands_from_player(self, player, commands):
         '''actions are limited to total unit count, extras will be trimmed
-        from the beginning
+        from the beginning. Rejected commands are returned in `errors` as
+        `{'command': command, 'reason': CommandError name}`
         '''
-        unit_lookup = {unit.id: unit for unit in self.all_units}
+        started = self._phase_start() if self.stats is not None else None
+        context = self.validation_context()
         actions = []
-        errors = []  # TODO maybe feedback, maybe clear error definitions
-        commands = commands[-1 * len(unit_lookup):]
+        errors = []
+        commands = commands[-1 * len(context.units):]
         for command in commands:
             try:
-                cmd = Command(player, command)
-                cmd.verify_unit(unit_lookup)
-                if cmd.action is ActionType.target:
-                    cmd.verify_target(unit_lookup, self.map)
-            except AssertionError:
-                errors.append(command)
+                cmd = context.validate(player, command)
+            except InvalidCommand as e:
+                errors.append(dict(command=command, reason=e.reason.name))
                 continue
             cmd.execute()
             actions.append(command)
+        if started is not None:
+            self._phase_end('commands_from_player', started)
+            self.stats.count('commands', len(actions))
+            self.stats.count('errors', len(errors))
         return dict(actions=actions, errors=errors)
 
     def _spawn_new_units(self):
@@ -161,39 +326,58 @@ class GameState(object):
     def _remove_dead_units(self):
         '''remove dead units and clear targets on them'''
         # TODO: might use for feedback
+        started = self._phase_start() if self.stats is not None else None
         dead_units = []
-        for tile in self.map.tiles():
-            dead_units.extend([unit for unit in tile.occupants if unit.health <= 0])
-            tile.occupants = [unit for unit in tile.occupants if unit.health > 0]
-        for unit in self.all_units:
-            if unit.target in dead_units:
-                unit.clear_target()
+        positions = {(unit.x, unit.y) for unit in self.all_units if unit.health <= 0}
+        for tile in [self.map.get_tile(*pos) for pos in positions]:
+            dead_units.extend(tile.remove_dead_units())
+        for unit in dead_units:
+            for attacker in self.map.registry.pop_attackers(unit):
+                if attacker.health > 0:
+                    attacker.clear_target()
+        if started is not None:
+            self._phase_end('remove_dead_units', started)
+            self.stats.count('dead_units', len(dead_units))
 
     def evaluate_turn(self):
         '''execute planned actions for one turn'''
-        for step in ('attack', 'move', 'chase', 'finish'):
-            # NOTE: execution order by-tile, all actions need to be synced, otherwise can be unfair
-            for unit in self.all_units:
-                unit.end_of_turn(step)
+        vectorized_turn = VectorizedTurn(self) if self.vectorized else None
+        # NOTE: execution order by-tile, all actions need to be synced, otherwise can be unfair
+        order = None if self.vectorized else {unit.id: index for index, unit in enumerate(self.all_units)}
+        for step in VectorizedTurn.steps:
+            started = self._phase_start() if self.stats is not None else None
+            if vectorized_turn is not None:
+                getattr(vectorized_turn, step)()
+            else:
+                self.map.phases.run(step, order)
+            if started is not None:
+                self._phase_end(step, started)
+        self._end_turn()
+
+    @staticmethod
+    def evaluate_turns(gamestates):
+        '''`evaluate_turn` of several games, those vectorized and without stats
+        resolved together by one `VectorizedTurn`
+        '''
+        batched = [gamestate for gamestate in gamestates if gamestate.vectorized and gamestate.stats is None]
+        if batched:
+            VectorizedTurn(*batched).run()
+        for gamestate in gamestates:
+            if gamestate.vectorized and gamestate.stats is None:
+                gamestate._end_turn()
+            else:
+                gamestate.evaluate_turn()
+
+    def _end_turn(self):
+        '''after the steps of the turn are resolved'''
         self._remove_dead_units()
         self._all_units = None
         self.turn += 1
+        if self.stats is not None:
+            self.stats.end_turn(self.turn - 1)
 
     def ascii(self, pid=None):
-        tmp_map = Map()
         if pid is not None:
             assert pid in (0, 1)
-            player = self.player0 if pid == 0 else self.player1
-            positions = self.map.vision_by_player(player)
-        else:
-            positions = None
-        for y in range(self.map.size_y):
-            for x in range(self.map.size_x):
-                if not self.map.is_valid_position(x, y):
-                    continue
-                if positions is None or (x, y) in positions:
-                    tmp_map.map[y][x] = self.map.get_tile(x, y)
-                else:
-                    tmp_map.map[y][x] = None
-
-        return tmp_map.as_string()
+            return self.map.as_string(positions=self.map.vision_by_player(self.players[pid]))
+        return self.map.as_string()
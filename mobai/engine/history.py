@@ -0,0 +1,77 @@
+'''Game history as periodic keyframes (full `codec` encodings) and per-turn
+deltas in between.
+
+A delta holds the encoded game header, the ids of all units in map order and
+their records XORed with the previous turn's ones (zeros for unchanged units
+and fields, the full record for spawned units), zlib compressed. Units no
+longer in the order have died.
+'''
+import struct
+import zlib
+
+from . import codec
+
+UNIT_ID = struct.Struct('<i')
+
+
+class Snapshot(object):
+    '''an encoded game split into its header and unit records by unit id'''
+    def __init__(self, game, records):
+        self.game = game  # packed codec.GAME
+        self.records = records  # unit id -> packed codec.UNIT_RECORD, map order
+
+    @staticmethod
+    def _split_records(data):
+        size = codec.UNIT_RECORD.size
+        return {
+            UNIT_ID.unpack_from(data, start)[0]: data[start:start + size] for start in range(0, len(data), size)
+        }
+
+    @classmethod
+    def from_encoded(cls, data):
+        game, records = codec.unpack(data)
+        return cls(game, cls._split_records(records))
+
+    @classmethod
+    def from_gamestate(cls, gamestate):
+        game, records = codec.encode_parts(gamestate)
+        return cls(game, cls._split_records(records))
+
+    def encode(self):
+        return codec.pack(self.game, b''.join(self.records.values()))
+
+    def delta_to(self, other):
+        '''delta that turns this snapshot into other'''
+        empty = bytes(codec.UNIT_RECORD.size)
+        order = list(other.records)
+        changes = b''.join(
+            _xor(self.records.get(unit_id, empty), record) for unit_id, record in other.records.items()
+        )
+        return dict(
+            game=other.game,
+            order=zlib.compress(struct.pack('<%di' % len(order), *order)),
+            records=zlib.compress(changes),
+        )
+
+    def apply(self, delta):
+        order = zlib.decompress(delta['order'])
+        order = struct.unpack('<%di' % (len(order) // UNIT_ID.size), order)
+        changes = zlib.decompress(delta['records'])
+        empty = bytes(codec.UNIT_RECORD.size)
+        size = codec.UNIT_RECORD.size
+        records = {}
+        for index, unit_id in enumerate(order):
+            records[unit_id] = _xor(self.records.get(unit_id, empty), changes[index * size:(index + 1) * size])
+        return Snapshot(delta['game'], records)
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'little') ^ int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def replay(keyframe, deltas):
+    '''snapshot reached by applying deltas in order to the encoded keyframe'''
+    snapshot = Snapshot.from_encoded(keyframe)
+    for delta in deltas:
+        snapshot = snapshot.apply(delta)
+    return snapshot
@@ -1,79 +1,130 @@
+from . import planes
 from .base import Player
 from .tile import GameTile
 from .unit import Fort, Tower, Soldier
-from .util import a_star_search
+from .routing import routing_table
+from .store import UnitStore
+from .topology import LANES, Topology
+from .occupancy import Occupancy
+from .phases import PhaseIndex
+from .registry import UnitRegistry
+from .vision import Vision
 
 
 class Map(object):
-    '''The Game map. 36x21 (default), 7:4 ratio with building placements as follows:
-    X: 0, 2, 5, 7
-    Y: 0, 2, 4
-    Buildings on either side are Forts
+    '''The Game map, laid out by a `Topology`: by default the original 36x21
+    lanes (see `Topology.lanes`), or any other, eg. a generated one. The
+    topology is shared with other games, a map only holds what changes
+    during its game: tiles, created as they're first needed, and units.
+
+    With `unit_store`, unit fields are kept in a UnitStore (`units`), eg.
+    for vectorized turns. Occupied tiles and units are found through the
+    occupancy and registry indexes kept up to date by tiles.
     '''
-    x_y_ratio = (7, 4)
-
-    def __init__(self, x=36, y=21, p0=None, p1=None):
-        assert (x - 1) % self.x_y_ratio[0] == 0
-        assert (y - 1) % self.x_y_ratio[1] == 0
-        self.size_x, self.size_y = x, y
-
-        # depends on ratio ([0, 10, 25, 35], [0, 10 , 20])
-        # self.building_x_markers = ((self.size_x - 1) / self.x_y_ratio[0]) * [0, 2, 5, 7]
-        # self.building_y_markers = ((self.size_y - 1) / self.x_y_ratio[1]) * [0, 2, 4]
-        x_step = int((self.size_x - 1) / self.x_y_ratio[0])
-        y_step = int((self.size_y - 1) / self.x_y_ratio[1])
-
-        # self.building_x_markers = numpy.multiply(x_step, [0, 2, 5, 7])
-        self.building_x_markers = [x_step * i for i in [0, 2, 5, 7]]
-        # self.building_y_markers = numpy.multiply(y_step, [0, 2, 4])
-        self.building_y_markers = [y_step * i for i in [0, 2, 4]]
-        # self.map = numpy.ndarray((self.size_y, self.size_x), dtype=GameTile)
-        self.map = [[None for x in range(self.size_x)] for y in range(self.size_y)]
-
-        for y in range(self.size_y):
-            for x in range(self.size_x):
-                if self.is_valid_position(x, y):
-                    self.map[y][x] = GameTile(x=x, y=y, _map=self)
+    def __init__(self, x=36, y=21, p0=None, p1=None, unit_store=False, topology=None):
+        self.topology = topology if topology is not None else Topology.build(LANES, x, y)
+        self.size_x, self.size_y = self.topology.size_x, self.topology.size_y
+        self.vision = Vision()
+        self.occupancy = Occupancy()
+        self.phases = PhaseIndex()
+        self.registry = UnitRegistry()
+        self.units = UnitStore() if unit_store else None
+        self.last_unit_id = -1
+        self.zobrist = None  # see GameState.hash
+        self._tiles = {}  # position -> GameTile, see `get_tile`
 
         if p0 is not None and p1 is not None:
             self.init_buildings(p0, p1)
 
     def init_buildings(self, p0, p1):
+        '''Forts and Towers at the topology's building positions, of the player whose side they're on'''
         assert isinstance(p0, Player)
         assert isinstance(p1, Player)
-        self.fort_positions, self.tower_positions = [], []
-        positions = []
-        for x in self.building_x_markers:
-            for y in self.building_y_markers:
-                positions.append((x, y))
-        for x, y in positions:
-            # min/max x has Forts, others are Towers
+        forts = set(self.fort_positions)
+        for x, y in self.topology.building_positions:
             player = p0 if self.is_position_player_side(x, y, p0) else p1
-            if x == 0 or x == self.size_x - 1:
-                self.map[y][x].add_unit(Fort(player))
-                self.fort_positions.append((x, y))
-            else:
-                self.map[y][x].add_unit(Tower(player))
-                self.tower_positions.append((x, y))
+            unit_class = Fort if (x, y) in forts else Tower
+            self.get_tile(x, y).add_unit(unit_class(player, self.new_unit_id()))
+
+    @property
+    def fort_positions(self):
+        return self.topology.fort_positions
+
+    @property
+    def tower_positions(self):
+        return self.topology.tower_positions
+
+    def fork(self):
+        '''independent copy of the map and its units, sharing the topology
+        and routing with this one instead of rebuilding them. Unit fields are
+        copied with the store columns, indexes are copied over to the clones.
+        '''
+        forked = object.__new__(Map)
+        forked.topology = self.topology
+        forked.size_x, forked.size_y = self.size_x, self.size_y
+        forked.last_unit_id = self.last_unit_id
+        forked.zobrist = None  # copied once the units are in place
+        forked.vision = self.vision.copy()
+        forked.occupancy = self.occupancy.copy()
+        forked.units = None if self.units is None else self.units.copy()
+        forked._tiles = {}
+
+        clones, originals = {}, []
+        for tile in self.occupied_tiles():
+            forked_tile = forked.get_tile(tile.x, tile.y)
+            forked_tile.occupants = [unit._fork(forked_tile) for unit in tile.occupants]
+            for clone in forked_tile.occupants:
+                clones[clone.id] = clone
+            originals.extend(tile.occupants)
+
+        def forked_target(target):
+            if target is None:
+                return None
+            if isinstance(target, GameTile):
+                return forked.get_tile(target.x, target.y)
+            return clones[target.id]
+
+        # targets point to units and tiles of this map, the indexes are copied over to the clones
+        if forked.units is None:
+            for unit in originals:
+                clones[unit.id]._target = forked_target(unit._target)
+        else:
+            targets = forked.units.target
+            for slot in forked.units.slots():
+                targets[slot] = forked_target(targets[slot])
+        forked.phases, forked.registry = self.phases.copy(clones), self.registry.copy(clones)
+        if self.zobrist is not None:
+            forked.zobrist = forked.vision.zobrist = self.zobrist.copy(forked)
+        return forked
+
+    def index_units(self, units):
+        '''what `GameTile.add_unit` keeps up to date, for units put on the
+        occupants of their tiles directly, all at once, eg. by a decoder. The
+        map has no other units or hash yet.
+        '''
+        assert not self.registry.units and self.zobrist is None
+        units = list(units)
+        self.vision.add_units(units)
+        self.occupancy.add_units(units)
+        self.phases.add_units(units)
+        self.registry.add_units(units)
+        if self.units is not None:
+            for unit in units:
+                self.units.add(unit)
+
+    def new_unit_id(self):
+        '''unit ids increase monotonically within a game'''
+        self.last_unit_id += 1
+        return self.last_unit_id
 
     def tiles(self):
-        for y in range(self.size_y):
-            for x in range(self.size_x):
-                # make sure it's a valid tile
-                if self.map[y][x] is None:
-                    continue
-                yield self.map[y][x]
+        '''all tiles in grid order, creating those that weren't needed yet'''
+        for x, y in self.topology.positions:
+            yield self.get_tile(x, y)
 
     def vision_by_player(self, player):
-        in_vision_positions = set()
-        for tile in self.tiles():
-            units = tile.units_by_player(player, sort_key=lambda u: u.vision)
-            if not units:
-                continue
-            # use the unit with max vision to calculate
-            max_vision_unit = units[-1]
-            in_vision_positions.update(max_vision_unit.visible_positions())
-        return in_vision_positions
+        '''positions visible by player, maintained by tiles as units come and go'''
+        return self.vision.positions(player)
 
     def tiles_visible_by_player(self, player):
         # sorted in direction right > bottom
@@ -82,24 +133,16 @@ class Map(object):
             sorted(self.vision_by_player(player), key=lambda p: p[1]),
             key=lambda p: p[0])
         for x, y in positions:
-            tiles.append(self.map[y][x])
+            tiles.append(self.get_tile(x, y))
         return tiles
 
     def player_has_vision(self, player, target):
         pos = target if isinstance(target, tuple) else (target.x, target.y)
-        return pos in self.vision_by_player(player)
+        return self.vision.has_vision(player, pos)
 
     def is_valid_position(self, x, y):
-        '''is position within boundaries and does it share an X or Y with any
-        building, which suggests a lane
-        '''
-        if x < 0 or y < 0:
-            return False
-        if x >= self.size_x or y >= self.size_y:
-            return False
-        if x in self.building_x_markers or y in self.building_y_markers:
-            return True
-        return False
+        '''is position within boundaries and on a lane'''
+        return self.topology.is_valid(x, y)
 
     def is_position_player_side(self, x, y, player):
         '''left half is player0, right half is player1'''
@@ -108,26 +151,37 @@ class Map(object):
         return (player.id == 0 and x < self.size_x / 2) or (player.id == 1 and x >= self.size_x / 2)
 
     def get_tile(self, x, y):
-        assert self.is_valid_position(x, y), 'x=%s y=%s is not a valid position' % (x, y)
-        return self.map[y][x]
+        tile = self._tiles.get((x, y))
+        if tile is None:
+            assert self.topology.is_valid(x, y), 'x=%s y=%s is not a valid position' % (x, y)
+            tile = self._tiles[(x, y)] = GameTile(x=x, y=y, _map=self)
+        return tile
 
     def get_neighbors_of_tile(self, tile):
         return [self.get_tile(x, y) for x, y in tile.neighbor_positions()]
 
     def shortest_path(self, start, end):
         '''Returns the list of steps on the shortest path between start and end.
-        Works with GameTile or tuples, return type will match be the input type
+        Works with GameTile or tuples, return type will match be the input type.
+        Paths are walked from the routing table shared by maps of this topology.
         '''
         assert type(start) == type(end)
         assert isinstance(start, (tuple, GameTile))
         if isinstance(start, GameTile):
-            path = a_star_search(self, (start.x, start.y), (end.x, end.y))
+            path = routing_table(self).path((start.x, start.y), (end.x, end.y))
             return [self.get_tile(*pos) for pos in path]
-        return a_star_search(self, start, end)
+        return routing_table(self).path(start, end)
+
+    def occupied_tiles(self):
+        '''tiles with units on them, in grid order'''
+        positions = set()
+        for counts in self.occupancy.counts.values():
+            positions.update(counts)
+        return [self._tiles[pos] for pos in sorted(positions, key=lambda pos: (pos[1], pos[0]))]
 
     def get_all_units(self, by_player=None):
         units = []
-        for tile in self.tiles():
+        for tile in self.occupied_tiles():
             if by_player is not None:
                 units.extend([unit for unit in tile.occupants if unit.player == by_player])
             else:
@@ -136,35 +190,48 @@ class Map(object):
 
     def get_forts(self, by_player=None):
         all_forts = []
-        for x, y in self.fort_positions:
-            all_forts.extend([unit for unit in self.map[y][x].occupants if isinstance(unit, Fort)])
-        assert len(all_forts) <= 6  # sanity-check
+        for pos in self.fort_positions:
+            tile = self._tiles.get(pos)
+            if tile is not None:
+                all_forts.extend([unit for unit in tile.occupants if isinstance(unit, Fort)])
+        assert len(all_forts) <= len(self.fort_positions)  # sanity-check
         if by_player is not None:
             return [fort for fort in all_forts if fort.player == by_player]
         return all_forts
 
-    def to_array(self, by_player=None):
-        data = [[None for x in range(self.size_x)] for y in range(self.size_y)]
-        if by_player is not None:
-            player_vision = self.vision_by_player(by_player)
-        for y in range(self.size_y):
-            for x in range(self.size_x):
-                if self.map[y][x] is None or (by_player is not None and (x, y) not in player_vision):
-                    data[y][x] = None
-                else:
-                    data[y][x] = self.map[y][x].to_dict()
+    def to_array(self, by_player=None, sparse=False):
+        '''map[y][x] of tiles (visible by player), null elsewhere. With `sparse`
+        only the tiles, in the same order, the cost then grows with the tiles
+        and not the area of the map
+        '''
+        positions = self.topology.positions if by_player is None else self.vision.visible(by_player)
+        if sparse:
+            return [self._tile_dict(x, y) for x, y in sorted(positions, key=lambda pos: (pos[1], pos[0]))]
+        data = [[None] * self.size_x for y in range(self.size_y)]
+        for x, y in positions:
+            data[y][x] = self._tile_dict(x, y)
         return data
 
-    def as_string(self):
-        '''ascii is not dead'''
+    def _tile_dict(self, x, y):
+        tile = self._tiles.get((x, y))
+        return tile.to_dict() if tile is not None else dict(posx=x, posy=y, occupants=[])
+
+    def to_planes(self, by_player, out=None):
+        '''NumPy feature planes as seen by player, see `planes`'''
+        return planes.encode(self, by_player, out=out)
+
+    def as_string(self, positions=None):
+        '''ascii is not dead, only `positions` are shown if given'''
         chars = []
+        occupied = None if self.units is None else set(self.units.occupied_positions())
         for y in range(self.size_y):
             for x in range(self.size_x):
-                if self.map[y][x] is None:
+                if not self.topology.is_valid(x, y) or (positions is not None and (x, y) not in positions):
                     chars.append(' ')
                     continue
 
-                occupants = self.map[y][x].occupants
+                tile = self._tiles.get((x, y))
+                occupants = tile.occupants if tile is not None and (occupied is None or (x, y) in occupied) else []
                 # this would be incorrect if a new type were added in between Fort and Tower
                 if [u for u in occupants if isinstance(u, Fort)]:
                     chars.append('F')
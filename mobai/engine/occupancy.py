@@ -0,0 +1,35 @@
+class Occupancy(object):
+    '''Unit counts of each player by position, kept up to date as units are
+    added to and removed from tiles, like `Vision`. Answers whether a tile
+    holds enemies of a player without going through its occupants.
+    '''
+    def __init__(self):
+        self.counts = {}  # player id -> {position: count}
+
+    def copy(self):
+        occupancy = Occupancy()
+        occupancy.counts = {player_id: dict(counts) for player_id, counts in self.counts.items()}
+        return occupancy
+
+    def add_unit(self, unit, pos):
+        counts = self.counts.setdefault(unit.player.id, {})
+        counts[pos] = counts.get(pos, 0) + 1
+
+    def add_units(self, units):
+        '''`add_unit` for many units at once, at the positions of their tiles'''
+        for unit in units:
+            counts = self.counts.setdefault(unit.player.id, {})
+            pos = (unit._tile.x, unit._tile.y)
+            counts[pos] = counts.get(pos, 0) + 1
+
+    def remove_unit(self, unit, pos):
+        counts = self.counts[unit.player.id]
+        count = counts[pos] - 1
+        if count:
+            counts[pos] = count
+        else:
+            del counts[pos]
+
+    def has_enemies(self, player, pos):
+        '''are there units of other players than player at pos'''
+        return any(pos in counts for player_id, counts in self.counts.items() if player_id != player.id)
@@ -0,0 +1,93 @@
+from .unit import Building, UnitBase
+
+STEPS = {
+    'attack': UnitBase._turn_attack_step,
+    'move': UnitBase._turn_move_step,
+    'chase': UnitBase._turn_chase_step,
+    'finish': UnitBase._turn_finish_step,
+}
+
+
+class PhaseIndex(object):
+    '''Units taking part in each phase of a turn, so that a phase only goes
+    through the units it can change anything for:
+
+        attack: buildings (they auto-target) and units targeting a unit
+        move:   mobile units with a path
+        chase:  units targeting a unit
+        finish: units targeting a tile
+
+    Kept up to date by tiles as units are added and removed, and by units as
+    their target or path changes. Paths running out as units move are only
+    noticed the next time the path or target is set, phases check their
+    units anyway. Units are kept by id.
+    '''
+    def __init__(self):
+        self.buildings, self.unit_targets, self.tile_targets, self.paths = {}, {}, {}, {}
+
+    def copy(self, units=None):
+        '''with the same units, or those of `units` (id -> unit) by id, eg. forked ones'''
+        index = PhaseIndex()
+        for name in ('buildings', 'unit_targets', 'tile_targets', 'paths'):
+            members = getattr(self, name)
+            setattr(index, name, dict(members) if units is None else {unit_id: units[unit_id] for unit_id in members})
+        return index
+
+    def add_unit(self, unit):
+        if isinstance(unit, Building):
+            self.buildings[unit.id] = unit
+        self.update(unit)
+
+    def add_units(self, units):
+        '''`add_unit` for many units at once, into an empty index'''
+        for unit in units:
+            unit_id, target = unit.id, unit.target
+            if isinstance(unit, Building):
+                self.buildings[unit_id] = unit
+            elif unit.path:
+                self.paths[unit_id] = unit
+            if isinstance(target, UnitBase):
+                self.unit_targets[unit_id] = unit
+            elif target is not None:
+                self.tile_targets[unit_id] = unit
+
+    def remove_unit(self, unit):
+        for members in (self.buildings, self.unit_targets, self.tile_targets, self.paths):
+            members.pop(unit.id, None)
+
+    def update(self, unit):
+        '''target or path of unit changed'''
+        unit_id, target = unit.id, unit.target
+        if target is None:
+            self.unit_targets.pop(unit_id, None)
+            self.tile_targets.pop(unit_id, None)
+        elif isinstance(target, UnitBase):
+            self.unit_targets[unit_id] = unit
+            self.tile_targets.pop(unit_id, None)
+        else:
+            self.tile_targets[unit_id] = unit
+            self.unit_targets.pop(unit_id, None)
+        if unit.mobile and unit.path:
+            self.paths[unit_id] = unit
+        else:
+            self.paths.pop(unit_id, None)
+
+    def members(self, phase):
+        '''units of phase by id'''
+        if phase == 'attack':
+            return {**self.buildings, **self.unit_targets}
+        if phase == 'move':
+            return self.paths
+        if phase == 'chase':
+            return self.unit_targets
+        if phase == 'finish':
+            return self.tile_targets
+        raise AssertionError('Uhm?')
+
+    def run(self, phase, order):
+        '''the step of phase for each of its units, in `order` (unit id ->
+        index, eg. in `all_units`), same as `end_of_turn(phase)` for all units
+        '''
+        step = STEPS[phase]
+        for unit in sorted(self.members(phase).values(), key=lambda unit: order[unit.id]):
+            step(unit)
@@ -0,0 +1,74 @@
+'''Fixed-shape NumPy feature planes of a map as seen by a player, an array
+alternative to `Map.to_array` for bots.
+
+Planes are `(len(PLANES), size_y, size_x)`, indexed as `[plane, y, x]`. Enemy
+units are only encoded where the player has vision.
+'''
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+from .store import UNIT_TYPES
+
+PLANES = (
+    'own_fort', 'own_tower', 'own_soldier',  # unit counts by type
+    'enemy_fort', 'enemy_tower', 'enemy_soldier',
+    'own_health', 'enemy_health',  # health sums
+    'visible', 'valid', 'building',  # masks
+)
+OWN_HEALTH, ENEMY_HEALTH, VISIBLE, VALID, BUILDING = (PLANES.index(name) for name in PLANES[6:])
+
+
+def plane_shape(_map):
+    return (len(PLANES), _map.size_y, _map.size_x)
+
+
+def _static(_map):
+    '''valid and building planes, kept by the topology'''
+    topology = _map.topology
+    if topology.planes is None:
+        planes = numpy.zeros((2, _map.size_y, _map.size_x), dtype=numpy.float32)
+        for x, y in topology.positions:
+            planes[0, y, x] = 1
+        for x, y in _map.fort_positions + _map.tower_positions:
+            planes[1, y, x] = 1
+        topology.planes = planes
+    return topology.planes
+
+
+def _unit_columns(_map):
+    '''player, type, health, x, y arrays of the units on the map'''
+    store = _map.units
+    if store is not None:
+        columns = [numpy.frombuffer(getattr(store, name), dtype=getattr(store, name).typecode)
+                   for name in ('id', 'player', 'type', 'health', 'x', 'y')]
+        live = columns[0] >= 0
+        return [column[live] for column in columns[1:]]
+    units = _map.get_all_units()
+    values = [(u.player.id, UNIT_TYPES.index(u.__class__.__name__), u.health, u.x, u.y) for u in units]
+    return list(numpy.array(values, dtype=numpy.int64).reshape(-1, 5).T)
+
+
+def encode(_map, player, out=None):
+    '''feature planes of map for player, written into `out` if given'''
+    assert numpy is not None, 'feature planes require numpy'
+    shape = plane_shape(_map)
+    if out is None:
+        out = numpy.zeros(shape, dtype=numpy.float32)
+    else:
+        assert out.shape == shape, 'expected planes of shape %s' % (shape,)
+        out.fill(0)
+
+    visible = out[VISIBLE]
+    positions = numpy.array(list(_map.vision.coverage.get(player.id, ())), dtype=numpy.intp).reshape(-1, 2)
+    visible[positions[:, 1], positions[:, 0]] = 1
+    out[VALID:BUILDING + 1] = _static(_map)
+
+    owner, unit_type, health, x, y = _unit_columns(_map)
+    enemy = owner != player.id
+    shown = ~enemy | (visible[y, x] > 0)
+    enemy, unit_type, health, x, y = enemy[shown], unit_type[shown], health[shown], x[shown], y[shown]
+    numpy.add.at(out, (unit_type + enemy * len(UNIT_TYPES), y, x), 1)
+    numpy.add.at(out, (numpy.where(enemy, ENEMY_HEALTH, OWN_HEALTH), y, x), health)
+    return out
@@ -0,0 +1,68 @@
+from .unit import UnitBase
+
+
+class UnitRegistry(object):
+    '''The units on a map by id, live unit counts by player and the units
+    targeting each unit. Kept up to date by tiles as units are placed, move
+    and die, and by units as their target changes, so none of it needs a
+    scan over the map.
+
+    `targeted_by` is target id -> {unit id: unit}, it's what lets dead units
+    be cleaned up from the targets of others without going through all
+    units.
+    '''
+    def __init__(self):
+        self.units = {}
+        self.counts = {}  # player id -> live unit count
+        self.targeted_by = {}
+
+    def copy(self, units=None):
+        '''with the same units, or those of `units` (id -> unit) by id, eg. forked ones'''
+        registry = UnitRegistry()
+        registry.counts = dict(self.counts)
+        if units is None:
+            registry.units = dict(self.units)
+            registry.targeted_by = {target_id: dict(by) for target_id, by in self.targeted_by.items()}
+        else:
+            registry.units = {unit_id: units[unit_id] for unit_id in self.units}
+            registry.targeted_by = {
+                target_id: {unit_id: units[unit_id] for unit_id in by} for target_id, by in self.targeted_by.items()
+            }
+        return registry
+
+    def add_unit(self, unit):
+        self.units[unit.id] = unit
+        self.counts[unit.player.id] = self.counts.get(unit.player.id, 0) + 1
+        self.retarget(unit, None, unit.target)
+
+    def add_units(self, units):
+        '''`add_unit` for many units at once, into an empty registry'''
+        for unit in units:
+            self.units[unit.id] = unit
+            self.counts[unit.player.id] = self.counts.get(unit.player.id, 0) + 1
+        for unit in units:
+            target = unit.target
+            if isinstance(target, UnitBase):
+                self.targeted_by.setdefault(target.id, {})[unit.id] = unit
+
+    def remove_unit(self, unit):
+        del self.units[unit.id]
+        self.counts[unit.player.id] -= 1
+        self.retarget(unit, unit.target, None)
+
+    def retarget(self, unit, previous, target):
+        '''target of unit changed from previous'''
+        if previous is target:
+            return
+        if isinstance(previous, UnitBase):
+            units = self.targeted_by.get(previous.id)
+            if units is not None:
+                units.pop(unit.id, None)
+                if not units:
+                    del self.targeted_by[previous.id]
+        if isinstance(target, UnitBase) and unit.id in self.units:
+            self.targeted_by.setdefault(target.id, {})[unit.id] = unit
+
+    def pop_attackers(self, unit):
+        '''units targeting unit, which are forgotten, eg. as unit died'''
+        return list(self.targeted_by.pop(unit.id, {}).values())
@@ -0,0 +1,144 @@
+'''Seekable game replays.
+
+A replay file holds the initial state, the accepted commands of every turn
+(the `actions` of `GameState.commands_from_player`) and a keyframe every
+`keyframe_interval` turns. Games are deterministic, ids are handed out in
+order by the map and spawning follows the turn count, so any turn is the
+nearest keyframe before it re-simulated with the recorded commands.
+
+Layout (little-endian):
+
+    header:   magic `MOBAIREPLAY`, version (B), keyframe interval (I)
+    records:  kind (c, `K` keyframe, `T` turn commands), turn (I), length (I),
+              then the `codec` encoded state or the zlib compressed json
+              of `[player0 actions, player1 actions]`
+    index:    record count (I), then kind, turn, offset (cIQ) per record
+    footer:   index offset (Q), magic
+'''
+import bisect
+import json
+import struct
+import zlib
+
+from .game import GameState
+
+MAGIC = b'MOBAIREPLAY'
+VERSION = 1
+
+HEADER = struct.Struct('<11sBI')
+RECORD = struct.Struct('<cII')
+INDEX_ENTRY = struct.Struct('<cIQ')
+COUNT = struct.Struct('<I')
+FOOTER = struct.Struct('<Q11s')
+KEYFRAME, TURN = b'K', b'T'
+
+
+class ReplayWriter(object):
+    '''Writes a replay to a binary file object as the game is played:
+
+        gs.begin_turn()
+        writer = ReplayWriter(fileobj, gs)
+        while ...:
+            actions = [gs.commands_from_player(...)['actions'] for each player]
+            writer.add_turn(gs, *actions)
+            gs.evaluate_turn()
+            gs.begin_turn()  # until finished
+            writer.begin_turn(gs)
+        writer.close()
+    '''
+    def __init__(self, fileobj, gamestate, keyframe_interval=20):
+        assert keyframe_interval > 0
+        self.fileobj = fileobj
+        self.keyframe_interval = keyframe_interval
+        self.index = []
+        fileobj.write(HEADER.pack(MAGIC, VERSION, keyframe_interval))
+        self._write(KEYFRAME, gamestate.turn, GameState.serialize(gamestate, binary=True))
+
+    def _write(self, kind, turn, data):
+        self.index.append((kind, turn, self.fileobj.tell()))
+        self.fileobj.write(RECORD.pack(kind, turn, len(data)))
+        self.fileobj.write(data)
+
+    def add_turn(self, gamestate, actions0, actions1):
+        '''accepted commands of both players, before `evaluate_turn`'''
+        data = json.dumps([actions0, actions1], separators=(',', ':')).encode()
+        self._write(TURN, gamestate.turn, zlib.compress(data))
+
+    def begin_turn(self, gamestate):
+        '''after `begin_turn`, keyframes are written every `keyframe_interval` turns'''
+        if gamestate.turn % self.keyframe_interval == 0:
+            self._write(KEYFRAME, gamestate.turn, GameState.serialize(gamestate, binary=True))
+
+    def close(self):
+        '''write the index, the file object is left open'''
+        index_offset = self.fileobj.tell()
+        self.fileobj.write(COUNT.pack(len(self.index)))
+        for entry in self.index:
+            self.fileobj.write(INDEX_ENTRY.pack(*entry))
+        self.fileobj.write(FOOTER.pack(index_offset, MAGIC))
+
+
+class Replay(object):
+    '''Reads a replay from a seekable binary file object. `state(turn)` is the
+    game at the beginning of turn (after `begin_turn`), decoded from the
+    nearest keyframe and re-simulated from there, so seeking costs at most
+    `keyframe_interval` turns. `turns` is the number of recorded turns,
+    `state(first_turn + turns)` is the final state.
+    '''
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        fileobj.seek(0)
+        magic, version, self.keyframe_interval = HEADER.unpack(fileobj.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError('not a replay')
+        if version != VERSION:
+            raise ValueError('unsupported replay version %d' % version)
+        fileobj.seek(-FOOTER.size, 2)
+        index_offset, magic = FOOTER.unpack(fileobj.read(FOOTER.size))
+        if magic != MAGIC:
+            raise ValueError('incomplete replay, no index')
+        fileobj.seek(index_offset)
+        count, = COUNT.unpack(fileobj.read(COUNT.size))
+        self.keyframes, self.commands = [], {}  # [(turn, offset)], {turn: offset}
+        for kind, turn, offset in INDEX_ENTRY.iter_unpack(fileobj.read(count * INDEX_ENTRY.size)):
+            if kind == KEYFRAME:
+                self.keyframes.append((turn, offset))
+            else:
+                self.commands[turn] = offset
+        self.first_turn = self.keyframes[0][0]
+        self.turns = len(self.commands)
+
+    def _read(self, offset):
+        self.fileobj.seek(offset)
+        kind, turn, length = RECORD.unpack(self.fileobj.read(RECORD.size))
+        return self.fileobj.read(length)
+
+    def actions(self, turn):
+        '''[player0 actions, player1 actions] accepted in turn'''
+        return json.loads(zlib.decompress(self._read(self.commands[turn])).decode())
+
+    def state(self, turn):
+        assert self.first_turn <= turn <= self.first_turn + self.turns, 'turn %d is not in replay' % turn
+        keyframe_turn, offset = self.keyframes[bisect.bisect_right(self.keyframes, (turn, float('inf'))) - 1]
+        gamestate = GameState.deserialize(self._read(offset))
+        while gamestate.turn < turn:
+            self.step(gamestate)
+        return gamestate
+
+    def step(self, gamestate):
+        '''re-simulate the recorded turn of gamestate, the last one ends with the game finished'''
+        actions0, actions1 = self.actions(gamestate.turn)
+        gamestate.commands_from_player(gamestate.player0, actions0)
+        gamestate.commands_from_player(gamestate.player1, actions1)
+        gamestate.evaluate_turn()
+        if not gamestate.finished:
+            gamestate.begin_turn()
+
+    def __iter__(self):
+        '''states of all turns in order'''
+        gamestate = self.state(self.first_turn)
+        yield gamestate
+        for _ in range(self.turns):
+            gamestate = gamestate.fork()
+            self.step(gamestate)
+            yield gamestate
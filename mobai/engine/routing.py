@@ -0,0 +1,167 @@
+import collections
+
+from .topology import LANES
+from .util import heuristic
+
+
+def routing_table(_map):
+    '''RoutingTable of the map's topology, shared by all maps laid out by it
+    and gone along with it, built on first use
+    '''
+    topology = _map.topology
+    if topology.routing is None:
+        topology.routing = RoutingTable(_map)
+    return topology.routing
+
+
+class RoutingTable(object):
+    '''Next-hop table for a static map, `next_hop[end][position]` is the next
+    position on the way from position to end. Filled in as paths are asked
+    for, so a path is only searched for once per topology while its field is
+    kept (see below).
+
+    Paths are the ones `a_star_search` finds, including its tie-breaking:
+    walking back from end, a position's predecessor is the one A* would have
+    expanded first, ie. the lowest `(heuristic, position)` among the neighbors
+    one step closer to start. On lanes, sub-paths of those paths are paths of
+    their own, so a path found fills in the table for all of its positions.
+
+    That doesn't hold on other topologies, where shortest paths tie more
+    often, and the table would depend on the order paths are asked for.
+    There the whole field of an end is filled at once instead, stepping to
+    the lowest `(heuristic, position)` neighbor one step closer to end.
+
+    Only the `max_fields` next-hop fields and `max_distances` distance maps
+    used last are kept, the others are searched for again when needed, to
+    the same result. Both grow with the number of positions, a table keeping
+    them for every position would grow with its square.
+
+    `searches` and `nodes` count the paths searched for and the positions
+    visited doing so, read by `GameStats`.
+    '''
+    max_fields = 1024
+    max_distances = 64
+
+    def __init__(self, _map):
+        self.positions = _map.topology.positions
+        self.neighbors = _map.topology.neighbors
+        self.subpaths = _map.topology.kind == LANES
+        self.next_hop = collections.OrderedDict()  # end -> {position: next position}, least recently used first
+        self._distances = collections.OrderedDict()  # start -> {position: distance}, the same
+        self.searches = self.nodes = 0
+
+    def _steps(self, end):
+        '''next-hop field of end'''
+        steps = self.next_hop.get(end)
+        if steps is None:
+            steps = self.next_hop[end] = {}
+            if len(self.next_hop) > self.max_fields:
+                self.next_hop.popitem(last=False)
+        else:
+            self.next_hop.move_to_end(end)
+        return steps
+
+    def distances_from(self, start):
+        '''breadth first search, move cost is always 1'''
+        distances = self._distances.get(start)
+        if distances is not None:
+            self._distances.move_to_end(start)
+            return distances
+        distances = {start: 0}
+        frontier = collections.deque([start])
+        while frontier:
+            current = frontier.popleft()
+            for neighbor in self.neighbors[current]:
+                if neighbor not in distances:
+                    distances[neighbor] = distances[current] + 1
+                    frontier.append(neighbor)
+        self._distances[start] = distances
+        if len(self._distances) > self.max_distances:
+            self._distances.popitem(last=False)
+        self.nodes += len(distances)
+        return distances
+
+    def _add_field(self, end):
+        distances = self.distances_from(end)
+        steps = self._steps(end)
+        self.searches += 1
+        for position, distance in distances.items():
+            if distance:
+                closer = [pos for pos in self.neighbors[position] if distances[pos] < distance]
+                steps[position] = min(closer, key=lambda pos: (heuristic(pos, end), pos))
+
+    def _add_path(self, start, end):
+        if not self.subpaths:
+            return self._add_field(end)
+        distances = self.distances_from(start)
+        steps = self._steps(end)
+        current = end
+        self.searches += 1
+        self.nodes += distances[end]
+        while current != start:
+            # lanes have no cycles of odd length, neighbors are never equally far
+            closer = [pos for pos in self.neighbors[current] if distances[pos] < distances[current]]
+            if len(closer) == 1:
+                previous = closer[0]
+            else:
+                previous = min(closer, key=lambda pos: (heuristic(pos, end), pos))
+            steps[previous] = current
+            current = previous
+
+    def next_step(self, position, end):
+        steps = self._steps(end)
+        if position not in steps:
+            self._add_path(position, end)
+        return steps[position]
+
+    def path(self, start, end):
+        '''list of positions from start (excluded) to end (included)'''
+        steps = self._steps(end)
+        if start != end and start not in steps:
+            self._add_path(start, end)
+        path = []
+        while start != end:
+            start = steps[start]
+            path.append(start)
+        return path
+
+
+class Path(object):
+    '''Remaining steps of a unit on its way to end, read from the routing
+    table as needed instead of being stored. All units heading to the same
+    end share its next-hop field. Behaves like the list of GameTiles from
+    `GameTile.path_to`, `advance` drops the first step.
+    '''
+    __slots__ = ('_map', 'position', 'end')
+
+    def __init__(self, _map, start, end):
+        self._map = _map
+        self.position = start
+        self.end = end
+
+    def _positions(self):
+        table = routing_table(self._map)
+        position = self.position
+        while position != self.end:
+            position = table.next_step(position, self.end)
+            yield position
+
+    def __bool__(self):
+        return self.position != self.end
+
+    def __len__(self):
+        return routing_table(self._map).distances_from(self.end)[self.position]
+
+    def __iter__(self):
+        for position in self._positions():
+            yield self._map.get_tile(*position)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index == 0 and self:
+            return self._map.get_tile(*routing_table(self._map).next_step(self.position, self.end))
+        return list(self)[index]
+
+    def advance(self):
+        self.position = routing_table(self._map).next_step(self.position, self.end)
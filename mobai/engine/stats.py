@@ -0,0 +1,44 @@
+import contextlib
+import time
+
+
+class GameStats(object):
+    '''Timers and counters of a game, enabled with `GameState(stats=...)`.
+
+    `times` holds total seconds and `calls` the number of timed calls by
+    phase (attack, move, chase, finish, remove_dead_units,
+    commands_from_player, begin_turn), `counters` running totals (commands,
+    errors, dead_units, path_searches, path_nodes, vision_updates,
+    vision_positions). The values of each turn are passed to `sink`, a
+    callable taking a dict, as the turn ends.
+    '''
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.times, self.calls, self.counters = {}, {}, {}
+        self.turn_times, self.turn_counters = {}, {}
+
+    def add_time(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.turn_times[name] = self.turn_times.get(name, 0.0) + seconds
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.turn_counters[name] = self.turn_counters.get(name, 0) + value
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        '''time a block, eg. persistence around the engine'''
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def end_turn(self, turn):
+        if self.sink is not None:
+            self.sink(dict(turn=turn, times=self.turn_times, counters=self.turn_counters))
+        self.turn_times, self.turn_counters = {}, {}
+
+    def as_dict(self):
+        return dict(times=dict(self.times), calls=dict(self.calls), counters=dict(self.counters))
@@ -0,0 +1,123 @@
+import array
+
+UNIT_TYPES = ('Fort', 'Tower', 'Soldier')
+
+
+class StoredAttribute(object):
+    '''Unit attribute that lives in a column of the unit's UnitStore once the
+    unit is stored, and on the unit itself before that (or without a store).
+    Changes of `hashed` attributes are passed on to the map's Zobrist hash,
+    changes of `indexed` ones (targets) to its `PhaseIndex` and `UnitRegistry`.
+    '''
+    def __init__(self, column, hashed=False, indexed=False):
+        self.column = column
+        self.local = '_' + column
+        self.hashed = hashed
+        self.indexed = indexed
+
+    def __get__(self, unit, owner=None):
+        if unit is None:
+            return self
+        if unit._store is None:
+            return getattr(unit, self.local)
+        return getattr(unit._store, self.column)[unit._slot]
+
+    def __set__(self, unit, value):
+        previous = None
+        if self.indexed and unit._tile is not None:
+            # forked units only get their own fields once handed back by the store
+            previous = getattr(unit, self.local, None) if unit._store is None else self.__get__(unit)
+        if unit._store is None:
+            setattr(unit, self.local, value)
+        else:
+            getattr(unit._store, self.column)[unit._slot] = value
+        if unit._tile is not None:
+            if self.hashed and unit._tile._map.zobrist is not None:
+                unit._tile._map.zobrist.update(unit)
+            if self.indexed:
+                unit._tile._map.phases.update(unit)
+                unit._tile._map.registry.retarget(unit, previous, value)
+
+
+class UnitStore(object):
+    '''Struct-of-arrays storage for the units of a map. Every unit placed on
+    the map gets a slot in parallel columns, units then act as views into
+    their slot. Slots of removed units are reused.
+
+    `units` and `target` are lists, the rest are `array.array` columns so
+    that they can be wrapped by numpy without copies.
+    '''
+    def __init__(self):
+        self.units = []
+        self.id = array.array('l')
+        self.player = array.array('b')
+        self.type = array.array('b')
+        self.health = array.array('l')
+        self.x = array.array('l')
+        self.y = array.array('l')
+        self.target = []
+        self.action_points = array.array('l')
+        self._free = []
+
+    columns = ('units', 'id', 'player', 'type', 'health', 'x', 'y', 'target', 'action_points')
+
+    def copy(self):
+        '''column copies, `units` and `target` still refer to the same objects'''
+        store = UnitStore()
+        for name in self.columns:
+            setattr(store, name, getattr(self, name)[:])
+        store._free = list(self._free)
+        return store
+
+    def restore(self, other):
+        '''take over the contents of a `copy` in place, units keep referring to this store'''
+        for name in self.columns:
+            getattr(self, name)[:] = getattr(other, name)
+        self._free = other._free
+
+    def __len__(self):
+        return len(self.units) - len(self._free)
+
+    def add(self, unit):
+        '''take over unit attributes into a new slot'''
+        assert unit._store is None
+        values = (
+            unit, unit.id, unit.player.id, UNIT_TYPES.index(unit.__class__.__name__), unit.health,
+            unit.x, unit.y, unit.target, unit.action_points,
+        )
+        columns = (
+            self.units, self.id, self.player, self.type, self.health,
+            self.x, self.y, self.target, self.action_points,
+        )
+        if self._free:
+            slot = self._free.pop()
+            for column, value in zip(columns, values):
+                column[slot] = value
+        else:
+            slot = len(self.units)
+            for column, value in zip(columns, values):
+                column.append(value)
+        unit._store, unit._slot = self, slot
+
+    def remove(self, unit):
+        '''hand attributes back to the unit and free its slot'''
+        assert unit._store is self
+        slot = unit._slot
+        unit._store, unit._slot = None, None
+        unit.health = self.health[slot]
+        unit.target = self.target[slot]
+        unit.action_points = self.action_points[slot]
+        self.units[slot] = self.target[slot] = None
+        self.id[slot] = -1
+        self._free.append(slot)
+
+    def move(self, unit):
+        self.x[unit._slot], self.y[unit._slot] = unit.x, unit.y
+
+    def slots(self):
+        return [slot for slot, unit in enumerate(self.units) if unit is not None]
+
+    def occupied_positions(self):
+        '''positions with units on them, in map grid order'''
+        positions = {(self.y[slot], self.x[slot]) for slot in self.slots()}
+        return [(x, y) for y, x in sorted(positions)]
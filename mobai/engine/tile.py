@@ -3,6 +3,8 @@ from .unit import Building
 
 class GameTile(object):
     '''A tile in map. Has position (reverse of array indices) and occupants'''
+    __slots__ = ('x', 'y', 'occupants', '_map')
+
     def __init__(self, x=None, y=None, occupants=None, _map=None):
         assert x is not None and y is not None
         self.x = x
@@ -37,13 +39,47 @@ class GameTile(object):
             assert not tile_buildings
         unit._tile = self
         self.occupants.append(unit)
+        self._map.vision.add_unit(unit)
+        self._map.occupancy.add_unit(unit, (self.x, self.y))
+        if unit.id not in self._map.registry.units:  # placed on the map, not moving in
+            self._map.phases.add_unit(unit)
+            self._map.registry.add_unit(unit)
+        if self._map.units is not None:
+            if unit._store is None:
+                self._map.units.add(unit)
+            else:
+                self._map.units.move(unit)
+        if self._map.zobrist is not None:
+            self._map.zobrist.add(unit)
 
     def remove_unit(self, unit):
+        '''take a moving unit off the tile, it stays on the map (in the unit
+        registry and phases) to be added to the next tile
+        '''
         assert unit in self.occupants
         assert not isinstance(unit, Building)
+        self._map.vision.remove_unit(unit)
+        self._map.occupancy.remove_unit(unit, (self.x, self.y))
         self.occupants.remove(unit)
         unit._tile = None
 
+    def remove_dead_units(self):
+        '''remove units with no health left, buildings included, return them'''
+        dead_units = [unit for unit in self.occupants if unit.health <= 0]
+        if dead_units:
+            for unit in dead_units:
+                self._map.vision.remove_unit(unit)
+                self._map.occupancy.remove_unit(unit, (self.x, self.y))
+                if self._map.zobrist is not None:
+                    self._map.zobrist.discard(unit)
+                if unit._store is not None:
+                    unit._store.remove(unit)
+                # once its fields are handed back by the store
+                self._map.phases.remove_unit(unit)
+                self._map.registry.remove_unit(unit)
+            self.occupants = [unit for unit in self.occupants if unit.health > 0]
+        return dead_units
+
     def grid_index(self):
         '''in 2d array, x is the second index (column) and y is the first (row)'''
         return (self.y, self.x)
@@ -51,9 +87,7 @@ class GameTile(object):
     def neighbor_positions(self):
         # TODO: maybe right side tiles start neighbor list at 9-oclock (-1, 0)
         # while left side tiles start at 3 oclock (+1, 0) for symmetry
-        x, y = self.x, self.y
-        positions = [(x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)]
-        return [pos for pos in positions if self._map.is_valid_position(*pos)]
+        return self._map.topology.neighbors[(self.x, self.y)]
 
     def is_neighbor(self, tile):
         tile_pos = (tile.x, tile.y)
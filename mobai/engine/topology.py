@@ -0,0 +1,208 @@
+'''Static map layouts. A Topology holds what never changes during a game:
+the size, which positions are lanes (a bitmap), the neighbors of every lane
+position and where buildings go. Maps read them from here instead of
+computing them, so lookups are O(1) whatever the size of the map. Range
+stencils, the positions within reach of a position, are built on first use.
+'''
+import collections
+import hashlib
+import random
+import struct
+
+LANES, GENERATED, CUSTOM = 0, 1, 2
+
+_topologies = collections.OrderedDict()  # Topology.key -> Topology, least recently used first
+
+
+class Topology(object):
+    '''`positions` are the lane positions, `building_positions` the building
+    ones in the order buildings are placed, `forts` the positions of those
+    which are Forts. `kind`, `seed` and `spacing` are what `build` needs to
+    make the same layout again, `key` identifies it.
+
+    Topologies don't change once built and are shared by all games laid out
+    the same way, see `build`. They are pickled by key. Those made with the
+    constructor are CUSTOM, `build` can't make them again: their key holds a
+    digest of the layout instead and they are pickled whole.
+
+    Only the `max_shared` used last are kept for sharing, with their routing
+    tables. Games keep theirs, layouts evicted are built again when needed.
+    '''
+    max_shared = 32
+
+    def __init__(self, size_x, size_y, positions, building_positions, forts, kind=CUSTOM, seed=0, spacing=0):
+        self.size_x, self.size_y = size_x, size_y
+        self.kind, self.seed, self.spacing = kind, seed, spacing
+        self.valid = bytearray(size_x * size_y)
+        for x, y in positions:
+            self.valid[y * size_x + x] = 1
+        # grid order, right > bottom
+        self.positions = sorted(set(positions), key=lambda pos: (pos[1], pos[0]))
+        self.neighbors = {
+            (x, y): [pos for pos in ((x + 1, y), (x, y + 1), (x - 1, y), (x, y - 1)) if self.is_valid(*pos)]
+            for x, y in self.positions
+        }
+        self.building_positions = list(building_positions)
+        self.fort_positions = [pos for pos in self.building_positions if pos in forts]
+        self.tower_positions = [pos for pos in self.building_positions if pos not in forts]
+        if kind == CUSTOM:
+            self.key = (kind, size_x, size_y, self._digest())
+        else:
+            self.key = (kind, size_x, size_y, seed, spacing)
+        self._stencils = {}  # (position, reach) -> set of positions
+        # built on first use by the modules using them, see `routing_table` and `planes`
+        self.routing = self.planes = None
+
+    @classmethod
+    def build(cls, kind, size_x, size_y, seed=0, spacing=0):
+        '''the shared topology of kind, built on first use'''
+        key = (kind, size_x, size_y, seed, spacing)
+        topology = _topologies.get(key)
+        if topology is None:
+            if kind == LANES:
+                topology = cls.lanes(size_x, size_y)
+            elif kind == GENERATED:
+                topology = cls.generate(size_x, size_y, seed=seed, spacing=spacing)
+            else:
+                raise ValueError('topologies of kind %d are not built from a key' % kind)
+        return cls._share(topology)
+
+    @classmethod
+    def _shared(cls, *args):
+        '''the shared CUSTOM topology laid out as args, when unpickling'''
+        return cls._share(cls(*args))
+
+    @classmethod
+    def _share(cls, topology):
+        '''the shared topology with the key of topology, which it becomes if there's none'''
+        topology = _topologies.setdefault(topology.key, topology)
+        _topologies.move_to_end(topology.key)
+        if len(_topologies) > cls.max_shared:
+            _topologies.popitem(last=False)
+        return topology
+
+    def _digest(self):
+        '''of the lanes and buildings, tells CUSTOM topologies apart'''
+        digest = hashlib.sha1(self.valid)
+        for positions in (self.fort_positions, self.tower_positions):
+            digest.update(struct.pack('<I', len(positions)))
+            for pos in positions:
+                digest.update(struct.pack('<II', *pos))
+        return digest.hexdigest()
+
+    def rebuildable(self):
+        '''does `build` make the same layout from the key'''
+        if self.kind == CUSTOM:
+            return False
+        other = Topology.build(*self.key)
+        return other is self or (other.valid == self.valid and other.building_positions == self.building_positions
+                                 and other.fort_positions == self.fort_positions)
+
+    def __reduce__(self):
+        if self.kind == CUSTOM:
+            return (Topology._shared, (self.size_x, self.size_y, self.positions, self.building_positions,
+                                       self.fort_positions))
+        return (Topology.build, self.key)
+
+    def is_valid(self, x, y):
+        '''is position within boundaries and on a lane'''
+        return 0 <= x < self.size_x and 0 <= y < self.size_y and self.valid[y * self.size_x + x] == 1
+
+    def within_range(self, pos, reach):
+        '''set of valid positions up to reach away from pos in a straight line,
+        pos included. Shared, not to be modified, iterates in the same order
+        for the same pos and reach.
+        '''
+        stencil = self._stencils.get((pos, reach))
+        if stencil is None:
+            x, y = pos
+            stencil = {pos}
+            for delta in range(1, reach + 1):
+                for p in [(x + delta, y), (x, y + delta), (x - delta, y), (x, y - delta)]:
+                    if self.is_valid(*p):
+                        stencil.add(p)
+            self._stencils[(pos, reach)] = stencil
+        return stencil
+
+    @classmethod
+    def lanes(cls, size_x=36, size_y=21):
+        '''The original layout, 7:4 ratio with buildings where the lanes cross:
+        X: 0, 2, 5, 7
+        Y: 0, 2, 4
+        Buildings on either side are Forts
+        '''
+        assert (size_x - 1) % 7 == 0
+        assert (size_y - 1) % 4 == 0
+        x_step, y_step = (size_x - 1) // 7, (size_y - 1) // 4
+        x_markers = [x_step * i for i in [0, 2, 5, 7]]
+        y_markers = [y_step * i for i in [0, 2, 4]]
+        positions = [(x, y) for y in range(size_y) for x in range(size_x) if x in x_markers or y in y_markers]
+        buildings = [(x, y) for x in x_markers for y in y_markers]
+        forts = {(x, y) for x, y in buildings if x == 0 or x == size_x - 1}
+        return cls(size_x, size_y, positions, buildings, forts, kind=LANES)
+
+    @classmethod
+    def generate(cls, size_x, size_y, seed=0, spacing=6):
+        '''A procedural lane network, mirrored so both sides are alike.
+
+        Junctions are laid out on the left half about `spacing` apart, joined
+        by straight lanes along a random spanning tree plus some extra lanes,
+        and the innermost column is joined to its mirror on some rows. Up to
+        three junctions on the edge are Forts, the junctions where three or
+        more lanes meet are Towers.
+        '''
+        assert size_x % 2 == 0, 'sides are split in the middle'
+        assert spacing >= 2
+        rng = random.Random(seed)
+
+        def markers(limit):
+            values = [0]
+            while values[-1] + spacing < limit:
+                values.append(values[-1] + rng.randint(max(2, spacing // 2), spacing))
+            return values
+
+        xs, ys = markers(size_x // 2 - 1), markers(size_y - 1)
+        if size_y - 1 - ys[-1] >= 2:
+            ys.append(size_y - 1)
+        junctions = [(i, j) for i in range(len(xs)) for j in range(len(ys))]
+        edges = [((i, j), (i + 1, j)) for i, j in junctions if i + 1 < len(xs)]
+        edges += [((i, j), (i, j + 1)) for i, j in junctions if j + 1 < len(ys)]
+        rng.shuffle(edges)
+
+        # random spanning tree (kruskal on shuffled edges), plus every third of the rest
+        parent = {junction: junction for junction in junctions}
+
+        def root(junction):
+            while parent[junction] != junction:
+                parent[junction] = junction = parent[parent[junction]]
+            return junction
+
+        lanes = []
+        for index, (a, b) in enumerate(edges):
+            if root(a) != root(b):
+                parent[root(a)] = root(b)
+                lanes.append((a, b))
+            elif index % 3 == 0:
+                lanes.append((a, b))
+
+        degree = dict.fromkeys(junctions, 0)
+        positions = set()
+        for (i, j), (k, l) in lanes:
+            degree[(i, j)] += 1
+            degree[(k, l)] += 1
+            for x in range(xs[i], xs[k] + 1):
+                for y in range(ys[j], ys[l] + 1):
+                    positions.add((x, y))
+        inner = xs[-1]
+        crossings = [y for y in ys if rng.random() < 0.5] or [rng.choice(ys)]
+        for y in crossings:
+            degree[(len(xs) - 1, ys.index(y))] += 1
+            positions.update((x, y) for x in range(inner, size_x // 2))
+        positions = {(x, y) for x, y in positions} | {(size_x - 1 - x, y) for x, y in positions}
+
+        forts = [(0, y) for y in sorted(rng.sample(ys, min(3, len(ys))))]
+        towers = [(xs[i], ys[j]) for i, j in junctions if degree[(i, j)] >= 3 and i > 0]
+        left = forts + towers
+        buildings = sorted(left + [(size_x - 1 - x, y) for x, y in left])
+        forts = set(forts) | {(size_x - 1 - x, y) for x, y in forts}
+        return cls(size_x, size_y, positions, buildings, forts, kind=GENERATED, seed=seed, spacing=spacing)
@@ -0,0 +1,60 @@
+from .routing import Path
+
+
+class UndoEntry(object):
+    '''The mutable state of a game at one point: tile occupants, vision
+    coverage, occupancy counts, phase index, unit registry, store columns
+    and the per-unit fields a turn changes. Units and tiles themselves are
+    shared with the game, reverting puts them back the way they were,
+    spawned units are dropped and dead ones come back.
+    '''
+    __slots__ = (
+        'turn', 'last_unit_id', 'tiles', 'coverage', 'occupancy', 'phases', 'registry', 'store', 'units', 'zobrist',
+    )
+
+    def __init__(self, gamestate):
+        game_map = gamestate.map
+        self.turn = gamestate.turn
+        self.last_unit_id = game_map.last_unit_id
+        self.tiles = [(tile, list(tile.occupants)) for tile in game_map.occupied_tiles()]
+        self.coverage = game_map.vision.copy().coverage
+        self.occupancy = game_map.occupancy.copy()
+        self.phases = game_map.phases.copy()
+        self.registry = game_map.registry.copy()
+        self.store = None if game_map.units is None else game_map.units.copy()
+        self.zobrist = None if game_map.zobrist is None else game_map.zobrist.copy(game_map)
+        self.units = []
+        for tile, occupants in self.tiles:
+            for unit in occupants:
+                path = getattr(unit, 'path', None)
+                fields = (unit, tile, unit._store, unit._slot, path, path.position if isinstance(path, Path) else None)
+                if self.store is None:
+                    fields += (unit.health, unit.target, unit.action_points)
+                self.units.append(fields)
+
+    def revert(self, gamestate):
+        '''an entry can only be reverted once'''
+        game_map = gamestate.map
+        game_map.zobrist = game_map.vision.zobrist = None  # restored as a whole below
+        for tile in game_map.occupied_tiles():
+            tile.occupants = []
+        for tile, occupants in self.tiles:
+            tile.occupants = occupants
+        game_map.vision.coverage = self.coverage
+        game_map.occupancy = self.occupancy
+        if self.store is not None:
+            game_map.units.restore(self.store)
+        for fields in self.units:
+            unit, unit._tile, unit._store, unit._slot, path, position = fields[:6]
+            if path is not None:
+                unit.path = path
+                if position is not None:
+                    path.position = position
+            if self.store is None:
+                unit.health, unit.target, unit.action_points = fields[6:]
+        # after the units, whose restored fields updated the old ones
+        game_map.phases, game_map.registry = self.phases, self.registry
+        game_map.zobrist = game_map.vision.zobrist = self.zobrist
+        game_map.last_unit_id = self.last_unit_id
+        gamestate.turn = self.turn
+        gamestate._all_units = None
@@ -1,14 +1,35 @@
-import uuid
+import logging
 
 from .base import IDComparable
+from .routing import Path
+from .store import StoredAttribute
+
+logger = logging.getLogger(__name__)
+
+
+def parse_unit_id(value):
+    '''unit ids are integers sent as strings, None if value isn't one'''
+    return int(value) if value.isdecimal() else None
 
 
 class UnitBase(IDComparable):
     '''Anything that sits on a GameTile is based on this, subclasses/mixins
-    add further properties. `UUID4.hex` ids
+    add further properties. Ids are integers given out by the map, unique
+    within a game. Health, target and action points are kept in the map's
+    UnitStore when it has one.
     '''
-    def __init__(self, player):
-        self.id = str(uuid.uuid4())
+    __slots__ = (
+        'id', '_health', 'vision', 'hit', 'attack', '_target', '_action_points', 'player', '_tile',
+        '_store', '_slot',
+    )
+    id_kind = 'unit'
+    health = StoredAttribute('health', hashed=True)
+    target = StoredAttribute('target', hashed=True, indexed=True)
+    action_points = StoredAttribute('action_points')
+
+    def __init__(self, player, id):
+        self._store, self._slot, self._tile = None, None, None
+        self.id = id
         self.health = 0
         self.vision = 0
         self.hit = 0
@@ -17,7 +38,33 @@ class UnitBase(IDComparable):
         self.action_points = 1
 
         self.player = player
-        self._tile = None
+
+    @classmethod
+    def _restore(cls, player, id, health, action_points, vision, hit, attack):
+        '''unit with these fields, not on a map yet, eg. while decoding'''
+        unit = object.__new__(cls)
+        unit._store, unit._slot, unit._tile = None, None, None
+        unit.id, unit.player = id, player
+        unit._health, unit._action_points, unit._target = health, action_points, None
+        unit.vision, unit.hit, unit.attack = vision, hit, attack
+        return unit
+
+    def _fork(self, tile):
+        '''copy of the unit on tile of a forked map, taking over the unit's
+        store slot if the map has a store. Target is left to the caller, none
+        of the map's indexes are updated.
+        '''
+        unit = object.__new__(self.__class__)
+        unit.id, unit.player, unit._tile = self.id, self.player, tile
+        unit.vision, unit.hit, unit.attack = self.vision, self.hit, self.attack
+        store = tile._map.units
+        if store is None:
+            unit._store = unit._slot = None
+            unit._health, unit._action_points, unit._target = self._health, self._action_points, None
+        else:
+            unit._store, unit._slot = store, self._slot
+            store.units[self._slot] = unit
+        return unit
 
     @property
     def x(self):
@@ -38,10 +85,10 @@ class UnitBase(IDComparable):
     def to_dict(self, as_target=False):
         if as_target:
             return dict(
-                id=self.id, posx=self.x, posy=self.y, type=self.__class__.__name__,
+                id=str(self.id), posx=self.x, posy=self.y, type=self.__class__.__name__,
             )
         data = dict(
-            id=self.id, posx=self.x, posy=self.y, type=self.__class__.__name__,
+            id=str(self.id), posx=self.x, posy=self.y, type=self.__class__.__name__,
             target=self.target.to_dict(as_target=True) if self.target else None,
             health=self.health, vision=self.vision, hit=self.hit, attack=self.attack,
             action_points=self.action_points, player=self.player.id,
@@ -51,14 +98,8 @@ class UnitBase(IDComparable):
         return data
 
     def positions_within_range(self, reach):
-        positions = set()
-        x, y = self.x, self.y
-        positions.add((x, y))
-        for delta in range(1, reach + 1):
-            for p in [(x + delta, y), (x, y + delta), (x - delta, y), (x, y - delta)]:
-                if self._tile._map.is_valid_position(*p):
-                    positions.add(p)
-        return positions
+        '''shared range stencil of the topology, not to be modified'''
+        return self._tile._map.topology.within_range((self.x, self.y), reach)
 
     def visible_positions(self):
         '''can see/within vision value'''
@@ -83,6 +124,16 @@ class UnitBase(IDComparable):
             units.extend([unit for unit in tile.occupants if unit.player != self.player])
         return units
 
+    def first_hittable_unit(self):
+        '''`hittable_units()[0]` or None, only looking into tiles with enemies'''
+        _map = self._tile._map
+        for pos in self.hit_positions():
+            if _map.occupancy.has_enemies(self.player, pos):
+                for unit in _map.get_tile(*pos).occupants:
+                    if unit.player != self.player:
+                        return unit
+        return None
+
     def can_act(self):
         '''has action points'''
         assert 0 <= self.action_points
@@ -127,7 +178,7 @@ class UnitBase(IDComparable):
         '''stop whatever you're doing'''
         self.clear_target()
 
-    def attack(self):
+    def attack_target(self):
         '''attack current target, decrease action points and target health'''
         #  sanity checks with target
         assert self.target
@@ -143,7 +194,7 @@ class UnitBase(IDComparable):
         if isinstance(self, Building) and not self.target and self.can_act():
             self.try_autotarget()
         if isinstance(self.target, UnitBase) and self.can_hit(self.target) and self.can_act():
-            self.attack()
+            self.attack_target()
 
     def _turn_move_step(self):
         '''units move step in turn'''
@@ -157,7 +208,7 @@ class UnitBase(IDComparable):
         # sanity-check
         elif self.path and not self.can_move_to(self.path[0]):
             # this should't really happen right? like, did I teleport?
-            print('WTF: next tile in path unreachable', self, type(self), self.id)  # TODO: logging
+            logger.warning('next tile in path of unit %s (%s) unreachable', self.id, type(self).__name__)
             self.path = []
             return
 
@@ -193,18 +244,22 @@ class UnitBase(IDComparable):
 
 
 class Building(object):
+    __slots__ = ()
+
     def move(self, *args):
         raise TypeError
 
     def try_autotarget(self):
         '''try to set a target I can hit'''
         assert not self.target
-        can_attack = self.hittable_units()
-        if can_attack:
-            self.set_target(can_attack[0])
+        target = self.first_hittable_unit()
+        if target is not None:
+            self.set_target(target)
 
 
 class Tower(Building, UnitBase):
+    __slots__ = ()
+
     def __init__(self, *args):
         super(Tower, self).__init__(*args)
         self.health = 100
@@ -214,6 +269,8 @@ class Tower(Building, UnitBase):
 
 
 class Fort(Tower):
+    __slots__ = ()
+
     def __init__(self, *args):
         super(Fort, self).__init__(*args)
         self.health = 150
@@ -222,10 +279,12 @@ class Fort(Tower):
 
     def spawn_soldiers(self, count=0):
         for _ in range(count):
-            self._tile.add_unit(Soldier(self.player))
+            self._tile.add_unit(Soldier(self.player, self._map.new_unit_id()))
 
 
 class Soldier(UnitBase):
+    __slots__ = ('_path',)
+
     def __init__(self, *args):
         super(Soldier, self).__init__(*args)
         self.health = 3
@@ -234,6 +293,30 @@ class Soldier(UnitBase):
         self.attack = 1
         self.path = []
 
+    @property
+    def path(self):
+        return self._path
+
+    @path.setter
+    def path(self, path):
+        self._path = path
+        if self._tile is not None:
+            self._tile._map.phases.update(self)
+            if self._tile._map.zobrist is not None:
+                self._tile._map.zobrist.update(self)
+
+    @classmethod
+    def _restore(cls, *args):
+        unit = super(Soldier, cls)._restore(*args)
+        unit._path = []
+        return unit
+
+    def _fork(self, tile):
+        unit = super(Soldier, self)._fork(tile)
+        path = self._path
+        unit._path = Path(tile._map, path.position, path.end) if isinstance(path, Path) else []
+        return unit
+
     def move(self, next_tile):
         '''move unit between tiles'''
         assert self.mobile
@@ -242,19 +325,25 @@ class Soldier(UnitBase):
         assert 0 < self.action_points
         self._tile.remove_unit(self)
         next_tile.add_unit(self)
-        self.path = self.path[1:]
+        self.path.advance()
         self.action_points -= 1
 
     def _set_move_target(self, target):
+        from .tile import GameTile
         if self._tile == target:
-            assert not self.path  # sanity
+            # already there, drop the rest of any previous path along with a
+            # tile target that would otherwise never be reached
+            self.path = []
+            if isinstance(self.target, GameTile):
+                self.target = None
             return  # TODO: might use for feedback
-        self.path = self._tile.path_to(target)
+        self.path = Path(self._map, (self.x, self.y), (target.x, target.y))
         self.target = target
 
     def _set_attack_target(self, target):
         super(Soldier, self)._set_attack_target(target)  # would raise if not if vision
         self._set_move_target(target._tile)
+        self.target = target  # keep chasing the unit, not the tile it was on
 
     def stop(self):
         super(Soldier, self).stop()
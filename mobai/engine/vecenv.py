@@ -0,0 +1,98 @@
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+from . import planes
+from .game import GameState
+
+
+class VectorEnv(object):
+    '''N headless games stepped in lockstep, eg. for bot training.
+
+    `step` takes a pair of command lists (player0, player1) per game and
+    returns the observations, rewards and done flags of all games. Rewards
+    are `(N, 2)`, 1 for the winner and -1 for the loser of a game finished in
+    this step, 0 otherwise (also for draws and games cut at `max_turns`).
+    Finished games are reset right away, the observation returned for them
+    is the first one of the new game and `infos` holds the final turn and
+    winner id of the finished one.
+
+    With `tensor_observations`, observations are feature planes (see `planes`)
+    in an `(N, 2, planes, size_y, size_x)` array that is reused between steps.
+
+    Requires numpy. With `vectorized`, the turns of all games are resolved
+    together by one `VectorizedTurn`: the attacks of all games are decided
+    and applied in one pass of array operations over their UnitStore columns
+    end to end. Moves, chases and the rest of a turn are still applied unit
+    by unit (see `VectorizedTurn`), so a step costs about N times what those
+    cost in one game. Map topology (routing tables) is shared by all games
+    of the same map size.
+    '''
+    def __init__(self, count, map_size=None, max_turns=None, vectorized=True, tensor_observations=False):
+        assert numpy is not None, 'vector environment requires numpy'
+        assert count > 0
+        self.count = count
+        self.map_size = map_size
+        self.max_turns = max_turns
+        self.vectorized = vectorized
+        self.tensor_observations = tensor_observations
+        self._planes = None
+        self.games = [None] * count
+        self.rewards = numpy.zeros((count, 2), dtype=numpy.float32)
+        self.dones = numpy.zeros(count, dtype=bool)
+
+    def _new_game(self, index):
+        gamestate = GameState(vectorized=self.vectorized, map_size=self.map_size)
+        gamestate.begin_turn()
+        self.games[index] = gamestate
+        return gamestate
+
+    def reset(self):
+        '''start all games over, returns the first observations'''
+        for index in range(self.count):
+            self._new_game(index)
+        return self.observations()
+
+    def observation(self, gamestate, player):
+        '''the state a player would receive from the server'''
+        return gamestate.state_for_player(player)
+
+    def observations(self):
+        '''`[player0, player1]` observations of each game'''
+        if self.tensor_observations:
+            if self._planes is None:
+                shape = planes.plane_shape(self.games[0].map)
+                self._planes = numpy.zeros((self.count, 2) + shape, dtype=numpy.float32)
+            for index, gs in enumerate(self.games):
+                gs.map.to_planes(gs.player0, out=self._planes[index, 0])
+                gs.map.to_planes(gs.player1, out=self._planes[index, 1])
+            return self._planes
+        return [[self.observation(gs, gs.player0), self.observation(gs, gs.player1)] for gs in self.games]
+
+    def step(self, commands):
+        '''apply `commands[i] = (player0 commands, player1 commands)` to game i
+        and evaluate the turn of all games, returns
+        `(observations, rewards, dones, infos)`, results are reused between steps
+        '''
+        assert len(commands) == self.count
+        self.rewards.fill(0)
+        self.dones.fill(False)
+        infos = [None] * self.count
+        for gamestate, (commands0, commands1) in zip(self.games, commands):
+            gamestate.commands_from_player(gamestate.player0, commands0)
+            gamestate.commands_from_player(gamestate.player1, commands1)
+        GameState.evaluate_turns(self.games)
+        for index, gamestate in enumerate(self.games):
+            if not gamestate.finished:
+                gamestate.begin_turn()
+                if self.max_turns is None or gamestate.turn < self.max_turns:
+                    continue
+            winner = gamestate.winner
+            if winner:
+                self.rewards[index, winner.id] = 1
+                self.rewards[index, 1 - winner.id] = -1
+            self.dones[index] = True
+            infos[index] = dict(turn=gamestate.turn, winner=winner.id if winner else None)
+            self._new_game(index)
+        return self.observations(), self.rewards, self.dones, infos
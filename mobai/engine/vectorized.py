@@ -0,0 +1,146 @@
+import logging
+
+try:
+    import numpy
+except ImportError:  # optional dependency
+    numpy = None
+
+from .tile import GameTile
+from .unit import Building, UnitBase
+
+logger = logging.getLogger(__name__)
+
+
+class VectorizedTurn(object):
+    '''Resolves the steps of a turn for all units at once, reaching the same
+    state as calling `UnitBase.end_of_turn` for every unit in order. Turns of
+    several games are resolved together, their UnitStore columns put end to
+    end (see `GameState.evaluate_turns`).
+
+    Decisions of a step only depend on state the step doesn't change (eg.
+    attacks don't depend on health, chasing doesn't move anyone), so they are
+    made with array operations over the map's UnitStore columns and applied
+    afterwards. Moves are applied in unit order to keep tile occupants in the
+    same order.
+
+    Only attacks are applied as array operations. Moving a unit, re-pathing a
+    chase and clearing a target update tiles, vision, indexes and the hash,
+    which are kept in Python objects, so they're still done unit by unit
+    (through `Soldier.move`, `set_target` and `clear_target`), and take up
+    most of a turn.
+    '''
+    steps = ('attack', 'move', 'chase', 'finish')
+
+    def __init__(self, *gamestates):
+        assert numpy is not None, 'vectorized turns require numpy'
+        assert all(gamestate.map.units is not None for gamestate in gamestates), \
+            'vectorized turns require a unit store'
+        self.stores = [gamestate.map.units for gamestate in gamestates]
+        # units of all games one game after the other, slots are offset by the store sizes of the games before
+        self.units, self.offsets, unit_offsets = [], [], []
+        offset = 0
+        for gamestate, store in zip(gamestates, self.stores):
+            units = gamestate.all_units
+            self.units.extend(units)
+            self.offsets.append(offset)
+            unit_offsets.extend([offset] * len(units))
+            offset += len(store.units)
+        self.unit_offsets = unit_offsets
+        self.slots = numpy.array([unit._slot for unit in self.units], dtype=numpy.intp) + unit_offsets
+
+    def _column(self, name):
+        '''numpy view of a store column, writes go to the store. With several
+        games a copy of their columns end to end, see `_write`
+        '''
+        columns = [numpy.frombuffer(getattr(store, name), dtype=getattr(store, name).typecode)
+                   for store in self.stores]
+        return columns[0] if len(columns) == 1 else numpy.concatenate(columns)
+
+    def _write(self, name, values):
+        '''put the values of a `_column` copy back into the stores'''
+        if len(self.stores) > 1:
+            for store, offset in zip(self.stores, self.offsets):
+                column = getattr(store, name)
+                numpy.frombuffer(column, dtype=column.typecode)[:] = values[offset:offset + len(column)]
+
+    def _unit_values(self, attribute):
+        return numpy.array([getattr(unit, attribute) for unit in self.units], dtype=numpy.int64)
+
+    def _target_slots(self):
+        '''slot of the unit targeted by each unit, -1 for tile or no target'''
+        slots = []
+        for unit, offset in zip(self.units, self.unit_offsets):
+            target = unit._store.target[unit._slot]
+            slots.append(target._slot + offset if isinstance(target, UnitBase) else -1)
+        return numpy.array(slots, dtype=numpy.intp)
+
+    def run(self):
+        for step in self.steps:
+            getattr(self, step)()
+
+    def attack(self):
+        '''autotarget for idle buildings, then scatter damage of units in range'''
+        action_points = self._column('action_points')
+        for unit, slot in zip(self.units, self.slots):
+            if isinstance(unit, Building) and not unit.target and action_points[slot] > 0:
+                unit.try_autotarget()
+
+        targets = self._target_slots()
+        x, y, player = self._column('x'), self._column('y'), self._column('player')
+        ux, uy, tx, ty = x[self.slots], y[self.slots], x[targets], y[targets]
+        reach = self._unit_values('hit')
+        in_range = ((ux == tx) & (numpy.abs(uy - ty) <= reach)) | ((uy == ty) & (numpy.abs(ux - tx) <= reach))
+        attacking = (
+            (targets >= 0) & in_range & (player[self.slots] != player[targets]) & (action_points[self.slots] > 0)
+        )
+        health = self._column('health')
+        numpy.subtract.at(health, targets[attacking], self._unit_values('attack')[attacking])
+        action_points[self.slots[attacking]] -= 1
+        self._write('health', health)
+        self._write('action_points', action_points)
+        attacked = {}  # by identity, units of different games have the same ids
+        for index in numpy.flatnonzero(attacking):
+            target = self.units[index].target
+            attacked[id(target)] = target
+        for target in attacked.values():
+            if target._tile._map.zobrist is not None:
+                target._tile._map.zobrist.update(target)
+
+    def move(self):
+        '''mobile units with a path step onto its next tile if they can act'''
+        moving = [index for index, unit in enumerate(self.units) if unit.mobile and unit.path]
+        if not moving:
+            return
+        next_tiles = [self.units[index].path[0] for index in moving]
+        slots = self.slots[moving]
+        x, y, action_points = self._column('x'), self._column('y'), self._column('action_points')
+        nx = numpy.array([tile.x for tile in next_tiles])
+        ny = numpy.array([tile.y for tile in next_tiles])
+        adjacent = numpy.abs(nx - x[slots]) + numpy.abs(ny - y[slots]) == 1
+        can_act = action_points[slots] > 0
+        for index, next_tile, is_adjacent, can_move in zip(moving, next_tiles, adjacent, can_act):
+            unit = self.units[index]
+            if is_adjacent and can_move:
+                unit.move(next_tile)
+            elif not is_adjacent:
+                logger.warning('next tile in path of unit %s (%s) unreachable', unit.id, type(unit).__name__)
+                unit.path = []
+
+    def chase(self):
+        '''re-path to targets still in vision, lose the others'''
+        targets = self._target_slots()
+        chasing = numpy.flatnonzero(targets >= 0)
+        x, y = self._column('x'), self._column('y')
+        for index, tx, ty in zip(chasing, x[targets[chasing]], y[targets[chasing]]):
+            unit = self.units[index]
+            if unit.mobile and unit._tile._map.vision.has_vision(unit.player, (tx, ty)):
+                unit.set_target(unit.target)
+            else:
+                unit.clear_target()
+
+    def finish(self):
+        '''clear reached tile targets'''
+        for unit in self.units:
+            if unit.mobile and not unit.path and isinstance(unit.target, GameTile):
+                assert unit._tile == unit.target
+                unit.clear_target()
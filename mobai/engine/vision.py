@@ -0,0 +1,85 @@
+class Vision(object):
+    '''Per-player vision of a map, kept up to date as units are added to and
+    removed from tiles instead of being recalculated from all tiles.
+
+    Every unit adds one to the coverage count of each position it can see, a
+    player has vision of a position as long as its count is above zero. Unit
+    vision ranges are assumed constant while the unit is on the map.
+
+    Positions a player gains or loses vision of are passed on to the map's
+    Zobrist hash when there is one (`zobrist`), updates are counted in the
+    game's `stats` when enabled.
+    '''
+    def __init__(self):
+        self.coverage = {}  # player id -> {position: count}
+        self.zobrist = None
+        self.stats = None
+
+    def copy(self):
+        vision = Vision()
+        vision.coverage = {player_id: dict(coverage) for player_id, coverage in self.coverage.items()}
+        return vision
+
+    def _player_coverage(self, player):
+        return self.coverage.setdefault(player.id, {})
+
+    def _count(self, positions):
+        self.stats.count('vision_updates')
+        self.stats.count('vision_positions', len(positions))
+
+    def add_unit(self, unit):
+        coverage = self._player_coverage(unit.player)
+        positions = unit.visible_positions()
+        if self.stats is not None:
+            self._count(positions)
+        for pos in positions:
+            count = coverage.get(pos, 0)
+            coverage[pos] = count + 1
+            if not count and self.zobrist is not None:
+                self.zobrist.toggle(unit.player.id, pos)
+
+    def add_units(self, units):
+        '''`add_unit` for many units at once, those seeing the same positions
+        are counted together
+        '''
+        if self.zobrist is not None or self.stats is not None:
+            for unit in units:
+                self.add_unit(unit)
+            return
+        groups = {}  # (player id, position, vision) -> [unit, count]
+        for unit in units:
+            key = (unit.player.id, unit._tile.x, unit._tile.y, unit.vision)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [unit, 1]
+            else:
+                group[1] += 1
+        for unit, count in groups.values():
+            coverage = self._player_coverage(unit.player)
+            for pos in unit.visible_positions():
+                coverage[pos] = coverage.get(pos, 0) + count
+
+    def remove_unit(self, unit):
+        coverage = self._player_coverage(unit.player)
+        positions = unit.visible_positions()
+        if self.stats is not None:
+            self._count(positions)
+        for pos in positions:
+            count = coverage[pos] - 1
+            if count:
+                coverage[pos] = count
+            else:
+                del coverage[pos]
+                if self.zobrist is not None:
+                    self.zobrist.toggle(unit.player.id, pos)
+
+    def positions(self, player):
+        '''set of positions currently visible by player'''
+        return set(self._player_coverage(player))
+
+    def visible(self, player):
+        '''positions visible by player without copying them, not to be modified'''
+        return self._player_coverage(player)
+
+    def has_vision(self, player, pos):
+        return pos in self._player_coverage(player)
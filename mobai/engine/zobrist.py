@@ -0,0 +1,88 @@
+'''Zobrist-style hashing of a map's units, kept up to date as units spawn,
+move, take damage, die and change targets.
+
+Each unit contributes a 64-bit part mixed from its id, type, player,
+position, health, target and path end. The hash is the XOR of all parts,
+so a change only needs the unit's old part XORed out and the new one in.
+Action points are left out, they are reset at the beginning of every turn.
+'''
+from .routing import Path
+from .store import UNIT_TYPES
+from .unit import UnitBase
+
+MASK = (1 << 64) - 1
+TYPE_INDEX = {name: index for index, name in enumerate(UNIT_TYPES)}
+
+
+def mix(value):
+    '''splitmix64 finalizer, a stable 64-bit mix of an integer'''
+    value = (value + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+
+def unit_part(unit):
+    tile, target, path = unit._tile, unit.target, getattr(unit, 'path', None)
+    if target is None:
+        target_code = 0
+    elif isinstance(target, UnitBase):
+        target_code = 1 | target.id << 2
+    else:
+        target_code = 2 | target.x << 2 | target.y << 18
+    path_code = 1 | path.end[0] << 1 | path.end[1] << 17 if isinstance(path, Path) else 0
+    identity = unit.id << 3 | TYPE_INDEX[unit.__class__.__name__] << 1 | unit.player.id
+    state = tile.x | tile.y << 16 | (unit.health & 0xFFFF) << 32
+    return mix(mix(mix(mix(identity) ^ state) ^ target_code) ^ path_code)
+
+
+class Zobrist(object):
+    '''Hash of all units of a map (`value`), and of the units on positions
+    each player can see (`visible`). The map and its vision notify it of
+    changes, see `GameState.hash`.
+    '''
+    def __init__(self, _map):
+        self.vision = _map.vision
+        self.value = 0
+        self.parts = {}  # unit id -> (part, position)
+        self.positions = {}  # position -> XOR of the parts of units there
+        self.visible = dict.fromkeys(self.vision.coverage, 0)  # player id -> XOR over visible positions
+        for unit in _map.get_all_units():
+            self.add(unit)
+
+    def copy(self, _map):
+        '''for a fork of the map, parts are keyed by unit id which forks keep'''
+        zobrist = object.__new__(Zobrist)
+        zobrist.vision = _map.vision
+        zobrist.value = self.value
+        zobrist.parts, zobrist.positions, zobrist.visible = dict(self.parts), dict(self.positions), dict(self.visible)
+        return zobrist
+
+    def _xor(self, pos, part):
+        self.value ^= part
+        self.positions[pos] = self.positions.get(pos, 0) ^ part
+        for player_id, coverage in self.vision.coverage.items():
+            if pos in coverage:
+                self.visible[player_id] = self.visible.get(player_id, 0) ^ part
+
+    def add(self, unit):
+        '''(re)hash a unit on the map'''
+        if unit.id in self.parts:
+            self._xor(*reversed(self.parts[unit.id]))
+        pos = (unit._tile.x, unit._tile.y)
+        part = unit_part(unit)
+        self.parts[unit.id] = (part, pos)
+        self._xor(pos, part)
+
+    def update(self, unit):
+        '''rehash a unit if it's hashed, others are yet to be added or already gone'''
+        if unit.id in self.parts:
+            self.add(unit)
+
+    def discard(self, unit):
+        part, pos = self.parts.pop(unit.id)
+        self._xor(pos, part)
+
+    def toggle(self, player_id, pos):
+        '''player gained or lost vision of pos'''
+        self.visible[player_id] = self.visible.get(player_id, 0) ^ self.positions.get(pos, 0)
@@ -0,0 +1,46 @@
+'''How runners hear of the commands posted for their game, instead of looking
+them up in mongodb over and over.
+
+The server publishes `{'turn': int, 'player_id': int, 'commands': list}` on
+the channel of a game once the commands are saved, the runner of the game
+gets them from the inbox it was handed when the channel was opened.
+Channels have `open(game_id)` returning the inbox (to be pickled over to
+the runner, `get(timeout=...)` raising `queue.Empty` if nothing came),
+`publish(game_id, message)` and `close(game_id)`. `LocalChannels` reaches
+runners started by the same server, a pub/sub across hosts would be set in
+its place with `set_channels`.
+'''
+import multiprocessing
+
+
+class LocalChannels(object):
+    '''a multiprocessing queue per game, publishing to games without an open
+    channel (eg. their runner was started elsewhere) is a no-op
+    '''
+    def __init__(self):
+        self._queues = {}
+
+    def open(self, game_id):
+        assert game_id not in self._queues
+        self._queues[game_id] = multiprocessing.Queue()
+        return self._queues[game_id]
+
+    def publish(self, game_id, message):
+        if game_id in self._queues:
+            self._queues[game_id].put(message)
+
+    def close(self, game_id):
+        self._queues.pop(game_id).close()
+
+
+channels = LocalChannels()
+
+
+def set_channels(other):
+    '''use other channels from now on, before any runner is started'''
+    global channels
+    channels = other
+
+
+def get_channels():
+    return channels
@@ -7,6 +7,7 @@ import motor.motor_tornado
 from tornado import gen
 from tornado import ioloop
 
+from .channels import get_channels
 from .runner import Runner
 from .utils import create_token
 
@@ -21,6 +22,16 @@ games = mc.mobai.games
 
 class MatchMaker(object):
     '''coroutine based mongodb backed matchmaker to be run within tornado'''
+    def __init__(self):
+        self.runners = {}  # game id -> runner process, while it has a channel open
+
+    def close_finished(self):
+        '''close the channels of runners that have exited'''
+        for game_idstr, process in list(self.runners.items()):
+            if not process.is_alive():
+                get_channels().close(game_idstr)
+                del self.runners[game_idstr]
+
     @gen.coroutine
     def match_game(self):
         multiprocessing.set_start_method('spawn')
@@ -40,10 +51,13 @@ class MatchMaker(object):
                 game_idstr = str(insert_result.inserted_id)
                 runner_name = 'runner-%s' % game_idstr
                 logger.info('Launching Process "%s"', runner_name)
-                p = multiprocessing.Process(target=Runner.start_game, args=(game_idstr,), name=runner_name, daemon=True)
+                inbox = get_channels().open(game_idstr)
+                p = multiprocessing.Process(target=Runner.start_game, args=(game_idstr,), kwargs={'inbox': inbox},
+                                            name=runner_name, daemon=True)
                 p.start()
-                # TODO keep track of spawned runner processes
+                self.runners[game_idstr] = p
                 yield gamequeue.delete_many({'_id': {'$in': queue_ids}})
+            self.close_finished()
             endtime = ioloop.IOLoop.current().time()
             logger.debug('MatchMaker ran for %.3fms', 1000 * (endtime - starttime))
             yield wait
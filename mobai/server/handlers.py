@@ -1,5 +1,7 @@
+import collections
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import tornado.web
 from tornado import gen
@@ -7,13 +9,21 @@ from tornado import gen
 from bson.objectid import ObjectId, InvalidId
 import motor.motor_tornado
 
+from mobai.server.channels import get_channels
 from mobai.server.gamequeue import is_in_queue, add_to_queue, has_game_ready
-from mobai.engine.game import GameState
+from mobai.server.utils import keyframe_query, deltas_query, play_on, rebuild_gamestate, turn_commands_query
 
 mc = motor.motor_tornado.MotorClient(w=1)
 users = mc.mobai.users
 games = mc.mobai.games
 commands = mc.mobai.commands
+turns = mc.mobai.turns
+
+# replays and plays turns again off the IOLoop, see `load_gamestate`
+executor = ThreadPoolExecutor(max_workers=4)
+# game oid -> the state last loaded, least recently used first, see `load_gamestate`
+MAX_CACHED_GAMES = 256
+_gamestates = collections.OrderedDict()
 
 
 class WTFException(Exception):
@@ -21,6 +31,48 @@ class WTFException(Exception):
     pass
 
 
+@gen.coroutine
+def load_gamestate(game_oid, turn):
+    '''state of a game turn, not to be modified. The state last loaded for the
+    game is kept: it's returned as is for the same turn, or a fork of it is
+    played on from the commands of the turns since. Otherwise the state is
+    rebuilt from the nearest keyframe and the deltas since, played on from
+    the commands of the turns the runner hasn't saved (yet). Only the reads
+    are done on the IOLoop, the rest by `executor`.
+    '''
+    cached = _gamestates.get(game_oid)
+    if cached is not None and cached.turn == turn:
+        _gamestates.move_to_end(game_oid)
+        return cached
+    if cached is not None and cached.turn < turn:
+        turn_commands = yield _turn_commands(game_oid, cached.turn, turn)
+        gs = yield executor.submit(lambda: play_on(cached.fork(), turn_commands, turn))
+    else:
+        keyframe = yield turns.find_one(keyframe_query(game_oid, turn), sort=[('turn', -1)])
+        deltas = yield turns.find(deltas_query(game_oid, keyframe['turn'], turn)).sort([('turn', 1)]).to_list(None)
+        saved_turn = deltas[-1]['turn'] if deltas else keyframe['turn']
+        turn_commands = {}
+        if saved_turn < turn:
+            turn_commands = yield _turn_commands(game_oid, saved_turn, turn)
+        gs = yield executor.submit(
+            rebuild_gamestate, keyframe['keyframe'], [doc['delta'] for doc in deltas], turn_commands, turn,
+        )
+    if cached is None or cached.turn <= gs.turn:  # requests of older turns don't replace it
+        _gamestates[game_oid] = gs
+        _gamestates.move_to_end(game_oid)
+        if len(_gamestates) > MAX_CACHED_GAMES:
+            _gamestates.popitem(last=False)
+    return gs
+
+
+@gen.coroutine
+def _turn_commands(game_oid, first_turn, turn):
+    '''{(turn, player_id): commands} of the turns from first_turn up to turn'''
+    query = turn_commands_query(game_oid, first_turn, turn)
+    docs = yield commands.find(query, {'turn': 1, 'player_id': 1, 'commands': 1}).to_list(None)
+    return {(doc['turn'], doc['player_id']): doc['commands'] for doc in docs}
+
+
 class BaseHandler(tornado.web.RequestHandler):
     def _decode_json_body(self):
         '''Try to decode json body and set attribute. Write error if cannot'''
@@ -130,16 +182,18 @@ class GameHandler(BaseHandler):
         if not (yield self._set_game_and_player_designation(game_id, username, token)):
             return
 
-        gs = GameState.deserialize(self.game['state'])
+        gs = yield load_gamestate(self.game['_id'], self.game['turn'])
         # temp
         gs.players = {0: gs.player0, 1: gs.player1}
-        map_for_player = gs.map.to_array(by_player=gs.players[self.player_id])
         data = dict(
             player_id=self.player_id,
             game_status=self.game['status'],
             turn=self.game['turn'],
-            map=map_for_player,
         )
+        if self.get_query_argument('sparse', 'false').lower() in ('1', 'true'):
+            data['tiles'] = gs.map.to_array(by_player=gs.players[self.player_id], sparse=True)
+        else:
+            data['map'] = gs.map.to_array(by_player=gs.players[self.player_id])
         self.write(data)
 
     @gen.coroutine
@@ -180,4 +234,7 @@ class GameHandler(BaseHandler):
         )
 
         yield commands.insert_one(doc)
+        get_channels().publish(str(self.game['_id']), dict(
+            turn=doc['turn'], player_id=doc['player_id'], commands=doc['commands'],
+        ))
         self.write({'status': 'commands saved'})
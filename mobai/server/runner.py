@@ -1,4 +1,7 @@
+import io
 import logging
+import queue
+import threading
 import time
 
 import click
@@ -6,6 +9,10 @@ from bson.objectid import ObjectId
 from pymongo import MongoClient
 
 from mobai.engine.game import GameState
+from mobai.engine.history import Snapshot, replay
+from mobai.engine.replay import ReplayWriter
+from mobai.engine.stats import GameStats
+from mobai.server.utils import keyframe_query, deltas_query, play_turn, turn_commands_query
 
 logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -13,36 +20,203 @@ logger = logging.getLogger(__name__)
 mc = MongoClient(w=1)
 games = mc.mobai.games
 commands = mc.mobai.commands
+turns = mc.mobai.turns
+
+
+class WriteBehind(object):
+    '''Runs writes on a thread of its own, one at a time in the order they
+    were put, so the game doesn't wait on them. A failed write stops the
+    writes after it (they'd depend on it) and is raised by the next `put`
+    or `flush`.
+    '''
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._work, daemon=True)
+        self._thread.start()
+
+    def _work(self):
+        while True:
+            write = self._queue.get()
+            try:
+                if self._error is None:
+                    write()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise(self):
+        if self._error is not None:
+            raise self._error
+
+    def put(self, write):
+        '''queue write, a callable'''
+        self._raise()
+        self._queue.put(write)
+
+    def flush(self):
+        '''wait for the queued writes to be done'''
+        self._queue.join()
+        self._raise()
 
 
 class Runner(object):
     '''A game runner that retrieves player commands and progresses the game,
     mongodb backed
+
+    The game is loaded once and kept in memory, only player commands are
+    read from mongodb while it runs. Its state is saved in `turns` every
+    `persist_interval` turns, as a full keyframe at least every
+    `keyframe_interval` turns and as a delta to the previously saved turn
+    otherwise. Saves and the turn updates of the game are written behind
+    (see `WriteBehind`) in order, the game document never points past the
+    commands a turn can be played again from. Turns in between saves are
+    played again from their commands (see `play_turn`), eg. to resume a
+    runner that went down.
+
+    Commands are announced on `inbox` as they are posted (see `channels`).
+    They're looked up in `commands` on start, then only when nothing was
+    announced for `resync_interval` seconds, or every `poll_interval`
+    seconds without an inbox.
     '''
+    keyframe_interval = 10
+    poll_interval = 0.1
+    resync_interval = 5
+
     @classmethod
-    def start_game(cls, game_id):
-        runner = cls(game_id)
+    def start_game(cls, game_id, **kwargs):
+        runner = cls(game_id, **kwargs)
         runner.run()
 
-    def __init__(self, game_id):
+    def __init__(self, game_id, persist_interval=1, inbox=None):
+        assert persist_interval >= 1
         self.game_strid = game_id
         self.game_oid = ObjectId(self.game_strid)
         if not games.find_one(self.game_oid, {'_id': 1}):
             raise TypeError('Game "%s" doesn\'t exist' % self.game_strid)
+        self.persist_interval = persist_interval
+        self._snapshot = None  # of the last saved or loaded turn, deltas are relative to it
+        self._keyframe_turn = None
+        self.writer = WriteBehind()
+        self.inbox = inbox
+        self._lookup = True  # announced before the runner (re)started
+        self.stats = GameStats(sink=self.log_turn_stats)
+
+    def log_turn_stats(self, turn_stats):
+        logger.debug('Game "%s" turn %d stats %s', self.game_strid, turn_stats['turn'], turn_stats)
 
-    def get_gamestate(self):
-        data = games.find_one({'_id': self.game_oid}, {'state': 1, '_id': 0})
-        return GameState.deserialize(data['state'])
+    def get_gamestate(self, turn=None):
+        '''state of turn (latest saved if None) from its nearest keyframe and the
+        deltas since, played on from commands past the last saved turn before it
+        '''
+        keyframe = turns.find_one(keyframe_query(self.game_oid, turn), sort=[('turn', -1)])
+        deltas = turns.find(deltas_query(self.game_oid, keyframe['turn'], turn)).sort([('turn', 1)])
+        snapshot = replay(keyframe['keyframe'], [doc['delta'] for doc in deltas])
+        gs = GameState.deserialize(snapshot.encode())
+        if turn is None:
+            self._snapshot, self._keyframe_turn = snapshot, keyframe['turn']
+        else:
+            self.play_to(gs, turn)
+        return gs
+
+    def play_to(self, gamestate, turn):
+        '''play the saved commands of the turns up to turn'''
+        while gamestate.turn < turn:
+            play_turn(gamestate, *[self.get_player_commands(player, gamestate.turn) or []
+                                   for player in (gamestate.player0, gamestate.player1)])
 
     def save_gamestate(self, gamestate):
-        data = GameState.serialize(gamestate)
-        games.update({'_id': self.game_oid}, {'$set': {'state': data}})
+        '''queue the state of the turn to be saved'''
+        snapshot, previous = Snapshot.from_gamestate(gamestate), self._snapshot
+        keyframe = previous is None or gamestate.turn - self._keyframe_turn >= self.keyframe_interval
+        query = {'game': self.game_oid, 'turn': gamestate.turn}
+
+        def write():
+            doc = dict(query)
+            if keyframe:
+                doc['keyframe'] = snapshot.encode()
+            else:
+                doc['delta'] = previous.delta_to(snapshot)
+            turns.replace_one(query, doc, upsert=True)
+
+        self.writer.put(write)
+        self._snapshot = snapshot
+        if keyframe:
+            self._keyframe_turn = gamestate.turn
+
+    def update_game(self, **fields):
+        '''queue a `$set` of fields on the game document'''
+        self.writer.put(lambda: games.update_one({'_id': self.game_oid}, {'$set': fields}))
+
+    def save_replay(self):
+        '''merge the commands of a finished game into a replay (see `mobai.engine.replay`)
+        by re-simulating it from the first turn, the commands are read at once
+        '''
+        final_turn = games.find_one(self.game_oid, {'turn': 1})['turn']
+        gs = self.get_gamestate(turn=0)
+        turn_commands = {
+            (doc['turn'], doc['player_id']): doc['commands']
+            for doc in commands.find(turn_commands_query(self.game_oid, 0, final_turn),
+                                     {'turn': 1, 'player_id': 1, 'commands': 1, '_id': 0})
+        }
+        data = io.BytesIO()
+        writer = ReplayWriter(data, gs)
+        while gs.turn < final_turn:
+            actions = [gs.commands_from_player(player, turn_commands.get((gs.turn, player.id), []))['actions']
+                       for player in (gs.player0, gs.player1)]
+            writer.add_turn(gs, *actions)
+            gs.evaluate_turn()
+            if gs.finished:
+                break
+            gs.begin_turn()
+            writer.begin_turn(gs)
+        writer.close()
+        games.update_one({'_id': self.game_oid}, {'$set': {'replay': data.getvalue()}})
 
     def get_player_commands(self, player, turn):
         player_commands = commands.find_one({'game': self.game_oid, 'player_id': player.id, 'turn': turn},
                                             {'commands': 1, '_id': 0})
         return player_commands if player_commands is None else player_commands['commands']
 
+    def _receive(self):
+        '''next message of the inbox, None if nothing came in time'''
+        if self.inbox is None:
+            time.sleep(self.poll_interval)
+            return None
+        try:
+            return self.inbox.get(timeout=self.resync_interval)
+        except queue.Empty:
+            return None
+
+    def wait_for_commands(self, gamestate):
+        '''commands of both players for the turn, as soon as both are in'''
+        turn_commands = dict.fromkeys(gamestate.players)
+        while None in turn_commands.values():
+            if self._lookup or self.inbox is None:
+                for player_id, player in gamestate.players.items():
+                    if turn_commands[player_id] is None:
+                        turn_commands[player_id] = self.get_player_commands(player, gamestate.turn)
+                self._lookup = False
+                if None not in turn_commands.values():
+                    break
+            message = self._receive()
+            if message is None:
+                self._lookup = True
+            elif message['turn'] == gamestate.turn and turn_commands[message['player_id']] is None:
+                turn_commands[message['player_id']] = message['commands']
+        return turn_commands[gamestate.player0.id], turn_commands[gamestate.player1.id]
+
+    def resume(self):
+        '''the game as the game document has it, loaded from its last saved turn'''
+        game = games.find_one(self.game_oid, {'turn': 1, '_id': 0})
+        with self.stats.timer('load'):
+            gs = self.get_gamestate()
+            self.play_to(gs, game['turn'])
+        if gs.turn != game['turn']:  # went down between saving the turn and updating the game
+            self.update_game(turn=gs.turn)
+        return gs
+
     def run(self):
         # start game if necessary
         g_status = games.find_one({'_id': self.game_oid}, {'status': 1, '_id': 0})['status']
@@ -50,57 +224,43 @@ class Runner(object):
             logger.info('Game "%s" is new, initializing', self.game_strid)
             gs = GameState()
             gs.begin_turn()
-            games.update({'_id': self.game_oid},
-                         {'$set': {'status': 'running', 'state': GameState.serialize(gs), 'turn': 0}})
+            self.save_gamestate(gs)
+            self.update_game(status='running', turn=0)
+            self.writer.flush()
             return self.run()
         elif g_status == 'finished':
-            # TODO: merge commands into game
             logger.info('Game "%s" is finished, finalizing', self.game_strid)
+            self.save_replay()
             return
 
+        gs = self.resume()
+        gs.set_stats(self.stats)
         while True:
-            game = games.find_one(self.game_oid)
-            gs = GameState.deserialize(game['state'])
-            assert game['turn'] == gs.turn
-
-            logger.info('Game "%s" turn "%d" loaded and running, waiting commands', self.game_strid, game['turn'])
-            p0commands, p1commands = None, None
-            # now we wait for commands
-            wait_start = time.time()
-            while p0commands is None or p1commands is None:
-                time.sleep(0.1)
-                if p0commands is None:
-                    p0commands = self.get_player_commands(gs.player0, gs.turn)
-                if p1commands is None:
-                    p1commands = self.get_player_commands(gs.player1, gs.turn)
-                if p0commands or p1commands:
-                    if time.time() - wait_start > 10:
-                        # TODO: stop game
-                        pass
-            logger.info('Game "%s" turn "%d" applying commands', self.game_strid, game['turn'])
-            p0_commands_result = gs.commands_from_player(gs.player0, p0commands)
-            p1_commands_result = gs.commands_from_player(gs.player1, p1commands)
+            turn = gs.turn
+            logger.info('Game "%s" turn "%d" running, waiting commands', self.game_strid, turn)
+            # TODO: stop game if a player doesn't send commands in time
+            p0commands, p1commands = self.wait_for_commands(gs)
+            logger.info('Game "%s" turn "%d" applying commands and advancing turn', self.game_strid, turn)
+            p0_commands_result, p1_commands_result = play_turn(gs, p0commands, p1commands)
             # TODO persist errors (command results)
-            logger.info('Game "%s" turn "%d" advancing turn', self.game_strid, game['turn'])
-            gs.evaluate_turn()
-            assert gs.turn == game['turn'] + 1
-            try:
-                gs.begin_turn()
-            except AssertionError:
+            assert gs.turn == turn + 1
+            if gs.finished:
                 logger.info('Game "%s" has ended with winner %s', self.game_strid, gs.winner)
-                state = GameState.serialize(gs)
-                games.update({'_id': self.game_oid},
-                             {'$set': {'state': state, 'turn': gs.turn, 'status': 'finished'}})
+                self.save_gamestate(gs)
+                self.update_game(turn=gs.turn, status='finished')
+                self.writer.flush()
                 return self.run()
-            state = GameState.serialize(gs)
-            games.update({'_id': self.game_oid},
-                         {'$set': {'state': state, 'turn': gs.turn}})
+            with self.stats.timer('persist'):
+                if gs.turn % self.persist_interval == 0:
+                    self.save_gamestate(gs)
+                self.update_game(turn=gs.turn)
 
 
 @click.command()
 @click.argument('game_id')
-def run_game(game_id):
-    Runner.start_game(game_id)
+@click.option('--persist-interval', default=1, help='save the game state every N turns')
+def run_game(game_id, persist_interval):
+    Runner.start_game(game_id, persist_interval=persist_interval)
 
 if __name__ == '__main__':
     run_game()
@@ -1,7 +1,65 @@
 import binascii
 import os
 
+from mobai.engine.game import GameState
+from mobai.engine.history import replay
+
 
 def create_token():
     return binascii.hexlify(os.urandom(16)).decode()
 
+
+def keyframe_query(game_oid, turn=None):
+    '''`turns` query for keyframes of game up to turn, newest is the one to replay from'''
+    query = {'game': game_oid, 'keyframe': {'$exists': True}}
+    if turn is not None:
+        query['turn'] = {'$lte': turn}
+    return query
+
+
+def deltas_query(game_oid, keyframe_turn, turn=None):
+    '''`turns` query for the deltas following a keyframe, up to turn'''
+    query = {'game': game_oid, 'turn': {'$gt': keyframe_turn}, 'delta': {'$exists': True}}
+    if turn is not None:
+        query['turn']['$lte'] = turn
+    return query
+
+
+def play_turn(gamestate, p0commands, p1commands):
+    '''apply the commands of both players and advance the game a turn the way
+    the runner does, returns the command results. Turns not saved in `turns`
+    are played again from their commands with it, the game is over once
+    `gamestate.finished`.
+    '''
+    results = (
+        gamestate.commands_from_player(gamestate.player0, p0commands),
+        gamestate.commands_from_player(gamestate.player1, p1commands),
+    )
+    gamestate.evaluate_turn()
+    try:
+        gamestate.begin_turn()
+    except AssertionError:  # finished
+        pass
+    return results
+
+
+def play_on(gamestate, turn_commands, turn):
+    '''play gamestate up to turn with `turn_commands` ({(turn, player_id): commands})'''
+    while gamestate.turn < turn:
+        play_turn(gamestate, turn_commands.get((gamestate.turn, 0), []), turn_commands.get((gamestate.turn, 1), []))
+    return gamestate
+
+
+def rebuild_gamestate(keyframe, deltas, turn_commands, turn):
+    '''state of turn from a keyframe and the deltas following it, played on
+    with `turn_commands` up to turn (see `play_on`)
+    '''
+    return play_on(GameState.deserialize(replay(keyframe, deltas).encode()), turn_commands, turn)
+
+
+def turn_commands_query(game_oid, first_turn, turn=None):
+    '''`commands` query for the commands of game from first_turn on, up to (not including) turn'''
+    query = {'game': game_oid, 'turn': {'$gte': first_turn}}
+    if turn is not None:
+        query['turn']['$lt'] = turn
+    return query
@@ -0,0 +1,69 @@
+'''Reference scripted bots. A bot is a callable taking the state a player
+receives (`GameState.state_for_player`, either format) and returning a list
+of commands, the same as a bot talking to the server would.
+'''
+
+
+def visible_tiles(state):
+    '''tiles of the state, from `tiles` of sparse states or the rows of `map`'''
+    if 'tiles' in state:
+        return state['tiles']
+    return [tile for row in state['map'] for tile in row if tile is not None]
+
+
+def visible_units(state):
+    '''(own, enemy) units in the state'''
+    own, enemy = [], []
+    for tile in visible_tiles(state):
+        for unit in tile['occupants']:
+            (own if unit['player'] == state['player_id'] else enemy).append(unit)
+    return own, enemy
+
+
+def distance(a, b):
+    return abs(a['posx'] - b['posx']) + abs(a['posy'] - b['posy'])
+
+
+def idle(state):
+    '''never does anything, buildings still defend themselves'''
+    return []
+
+
+def rusher(state):
+    '''soldiers attack the closest visible enemy, otherwise march to the
+    visible tile furthest towards the enemy side
+    '''
+    own, enemy = visible_units(state)
+    soldiers = [unit for unit in own if unit['type'] == 'Soldier']
+    if not soldiers:
+        return []
+    commands = []
+    if enemy:
+        for soldier in soldiers:
+            target = min(enemy, key=lambda unit: (distance(soldier, unit), int(unit['id'])))
+            commands.append(dict(id=soldier['id'], action='target', target=target['id']))
+        return commands
+
+    forward = 1 if state['player_id'] == 0 else -1
+    tiles = visible_tiles(state)
+    for soldier in soldiers:
+        if soldier['target'] is not None:
+            continue
+        tile = max(tiles, key=lambda tile: (forward * tile['posx'], -distance(soldier, tile)))
+        if (tile['posx'], tile['posy']) != (soldier['posx'], soldier['posy']):
+            commands.append(dict(id=soldier['id'], action='target', target=dict(posx=tile['posx'], posy=tile['posy'])))
+    return commands
+
+
+def defender(state):
+    '''soldiers stay home and attack enemies within sight'''
+    own, enemy = visible_units(state)
+    commands = []
+    for soldier in (unit for unit in own if unit['type'] == 'Soldier'):
+        if soldier['target'] is None and enemy:
+            target = min(enemy, key=lambda unit: (distance(soldier, unit), int(unit['id'])))
+            commands.append(dict(id=soldier['id'], action='target', target=target['id']))
+    return commands
+
+
+BOTS = {'idle': idle, 'rusher': rusher, 'defender': defender}
@@ -0,0 +1,113 @@
+import importlib
+import itertools
+import json
+import logging
+import multiprocessing
+import time
+
+import click
+
+from mobai.engine.game import GameState
+from mobai.tournament.bots import BOTS
+
+logging.basicConfig(format='%(asctime)s %(levelname)-8s %(message)s', level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_bot(name):
+    '''a built-in bot by name or any callable as `module:attribute`'''
+    if name in BOTS:
+        return BOTS[name]
+    module, _, attribute = name.partition(':')
+    assert attribute, 'bot "%s" is neither built-in nor module:attribute' % name
+    return getattr(importlib.import_module(module), attribute)
+
+
+def play_game(game):
+    '''play one game between `game['bots']` (player0, player1) until finished or
+    `game['max_turns']`, returns the result record
+    '''
+    bots = [load_bot(name) for name in game['bots']]
+    gs = GameState(**game.get('gamestate', {}))
+    gs.begin_turn()
+    bot_seconds = [0.0, 0.0]
+    started = time.perf_counter()
+    while gs.turn < game['max_turns']:
+        for player, bot in zip((gs.player0, gs.player1), bots):
+            state = gs.state_for_player(player, sparse=True)
+            bot_started = time.perf_counter()
+            commands = bot(state)
+            bot_seconds[player.id] += time.perf_counter() - bot_started
+            gs.commands_from_player(player, commands)
+        gs.evaluate_turn()
+        if gs.finished:
+            break
+        gs.begin_turn()
+    seconds = time.perf_counter() - started
+    winner = gs.winner
+    return dict(
+        game=game['game'], bots=game['bots'], winner=winner.id if winner else None, turns=gs.turn,
+        seconds=seconds, engine_seconds=seconds - sum(bot_seconds), bot_seconds=bot_seconds,
+    )
+
+
+def schedule(bots, games, max_turns, gamestate=None):
+    '''`games` games for each pairing of bots, alternating sides'''
+    number = itertools.count()
+    for pairing in itertools.combinations(bots, 2):
+        for i in range(games):
+            yield dict(
+                game=next(number), bots=pairing if i % 2 == 0 else pairing[::-1], max_turns=max_turns,
+                gamestate=gamestate or {},
+            )
+
+
+class Tournament(object):
+    '''Plays games between in-process bots on a process pool, results are
+    written to `output` as json lines as soon as games finish
+    '''
+    def __init__(self, bots, games=10, max_turns=1000, processes=None, gamestate=None):
+        assert len(bots) >= 2
+        for name in bots:
+            load_bot(name)  # fail early
+        self.bots = bots
+        self.games = games
+        self.max_turns = max_turns
+        self.processes = processes or multiprocessing.cpu_count()
+        self.gamestate = gamestate
+
+    def run(self, output):
+        '''returns {bot: wins} over all games'''
+        wins = dict.fromkeys(self.bots, 0)
+        started, played = time.perf_counter(), 0
+        with multiprocessing.Pool(self.processes) as pool:
+            games = schedule(self.bots, self.games, self.max_turns, self.gamestate)
+            for result in pool.imap_unordered(play_game, games):
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+                if result['winner'] is not None:
+                    wins[result['bots'][result['winner']]] += 1
+                played += 1
+        elapsed = time.perf_counter() - started
+        logger.info('%d games in %.1fs (%.1f games/s) on %d processes', played, elapsed, played / elapsed,
+                    self.processes)
+        return wins
+
+
+@click.command()
+@click.argument('bots', nargs=-1, required=True)
+@click.option('--games', default=10, help='games per pairing')
+@click.option('--max-turns', default=1000)
+@click.option('--processes', default=None, type=int, help='defaults to cpu count')
+@click.option('--map-size', default=None, help='XxY, eg. 22x13')
+@click.option('--output', default='results.jsonl', type=click.File('w'))
+def run_tournament(bots, games, max_turns, processes, map_size, output):
+    '''play BOTS (built-in names or module:callable) against each other'''
+    gamestate = dict(map_size=tuple(int(v) for v in map_size.split('x'))) if map_size else None
+    wins = Tournament(list(bots), games=games, max_turns=max_turns, processes=processes,
+                      gamestate=gamestate).run(output)
+    for bot, count in sorted(wins.items(), key=lambda item: -item[1]):
+        click.echo('%s: %d' % (bot, count))
+
+if __name__ == '__main__':
+    run_tournament()
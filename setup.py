@@ -16,9 +16,13 @@ setup(
         'Click',
         'pymongo',
     ],
+    extras_require={
+        'numpy': ['numpy'],
+    },
     entry_points={
         'console_scripts': [
             'run_game = mobai.runner.runner:run_game',
+            'run_tournament = mobai.tournament.runner:run_tournament',
         ]
     },
     classifiers=[
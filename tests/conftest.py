@@ -0,0 +1,89 @@
+'''Fixtures shared by the tests: games of each mode played for a while, and
+the helpers to make, play and compare them.
+'''
+import random
+
+import pytest
+
+from mobai.engine.game import GameState
+
+MODES = {'plain': {}, 'unit_store': {'unit_store': True}, 'vectorized': {'vectorized': True}}
+
+
+def _new_game(**kwargs):
+    '''a GameState after its first `begin_turn`'''
+    gamestate = GameState(**kwargs)
+    gamestate.begin_turn()
+    return gamestate
+
+
+def _play(gamestate, turns, seed=0):
+    '''units target random visible enemies, or advance to the visible tile
+    furthest towards the enemy side, from after `begin_turn`
+    '''
+    rng = random.Random(seed)
+    for _ in range(turns):
+        for player in (gamestate.player0, gamestate.player1):
+            visible = sorted(gamestate.map.vision.visible(player))
+            enemies = [unit for unit in gamestate.all_units
+                       if unit.player != player and (unit.x, unit.y) in gamestate.map.vision.visible(player)]
+            commands = []
+            for unit in gamestate.map.get_all_units(by_player=player):
+                if enemies and rng.random() < 0.5:
+                    commands.append({'id': str(unit.id), 'action': 'target', 'target': str(rng.choice(enemies).id)})
+                elif unit.mobile and not unit.path:
+                    forward = max(x if player.id == 0 else -x for x, y in visible)
+                    x, y = rng.choice([(x, y) for x, y in visible if (x if player.id == 0 else -x) == forward])
+                    commands.append({'id': str(unit.id), 'action': 'target', 'target': {'posx': x, 'posy': y}})
+            gamestate.commands_from_player(player, commands)
+        gamestate.evaluate_turn()
+        if gamestate.finished:
+            break
+        gamestate.begin_turn()
+    return gamestate
+
+
+def _indexes(gamestate):
+    '''copies of what the map keeps indexed, to be compared between games or
+    with the same game later
+    '''
+    game_map = gamestate.map
+    return dict(
+        coverage={player_id: dict(counts) for player_id, counts in game_map.vision.coverage.items()},
+        occupancy={player_id: dict(counts) for player_id, counts in game_map.occupancy.counts.items()},
+        counts=dict(game_map.registry.counts),
+        units=sorted(game_map.registry.units),
+        targeted_by={target_id: sorted(units) for target_id, units in game_map.registry.targeted_by.items()},
+        # units whose path ran out are only dropped from `move` as their path is set again
+        phases={phase: sorted(unit_id for unit_id, unit in game_map.phases.members(phase).items()
+                              if phase != 'move' or unit.path)
+                for phase in ('attack', 'move', 'chase', 'finish')},
+        store=None if game_map.units is None else sorted(game_map.units.id[slot] for slot in game_map.units.slots()),
+    )
+
+
+@pytest.fixture
+def new_game():
+    return _new_game
+
+
+@pytest.fixture
+def play():
+    return _play
+
+
+@pytest.fixture
+def indexes():
+    return _indexes
+
+
+@pytest.fixture(params=sorted(MODES))
+def mode(request):
+    '''GameState keyword arguments of each mode'''
+    return MODES[request.param]
+
+
+@pytest.fixture
+def gamestate(mode):
+    '''a game of each mode, 40 turns in'''
+    return _play(_new_game(**mode), 40)
@@ -0,0 +1,48 @@
+import multiprocessing
+import queue
+
+import pytest
+
+from mobai.server import channels
+from mobai.server.channels import LocalChannels
+
+
+def echo(inbox, outbox):
+    '''in another process, pass on the message received'''
+    outbox.put(inbox.get(timeout=10))
+
+
+def test_local_channels():
+    local = LocalChannels()
+    inbox = local.open('game')
+    with pytest.raises(AssertionError):
+        local.open('game')
+    message = {'turn': 3, 'player_id': 1, 'commands': [{'id': '7', 'action': 'stop'}]}
+    local.publish('game', message)
+    local.publish('other', message)  # no channel open, eg. the runner is elsewhere
+    assert inbox.get(timeout=10) == message
+    with pytest.raises(queue.Empty):
+        inbox.get(timeout=0.01)
+    local.close('game')
+    local.publish('game', message)
+    inbox = local.open('game')  # again, eg. the runner was restarted
+    with pytest.raises(queue.Empty):
+        inbox.get(timeout=0.01)
+
+
+def test_inbox_reaches_another_process():
+    local = LocalChannels()
+    inbox, outbox = local.open('game'), multiprocessing.Queue()
+    process = multiprocessing.Process(target=echo, args=(inbox, outbox))
+    process.start()
+    local.publish('game', {'turn': 0, 'player_id': 0, 'commands': []})
+    assert outbox.get(timeout=10) == {'turn': 0, 'player_id': 0, 'commands': []}
+    process.join(10)
+    local.close('game')
+
+
+def test_set_channels(monkeypatch):
+    monkeypatch.setattr(channels, 'channels', channels.channels)
+    other = LocalChannels()
+    channels.set_channels(other)
+    assert channels.get_channels() is other
@@ -0,0 +1,77 @@
+import zlib
+
+import pytest
+
+from mobai.engine import codec
+from mobai.engine.game import GameState
+from mobai.engine.history import Snapshot, replay
+
+
+def test_round_trip(gamestate, indexes):
+    data = codec.encode(gamestate)
+    decoded = GameState.deserialize(data)
+    assert codec.encode(decoded) == data
+    assert decoded.hash == gamestate.hash
+    assert indexes(decoded) == indexes(gamestate)
+    assert decoded.map.to_array() == gamestate.map.to_array()
+
+
+def test_round_trip_plays_on(gamestate, play, indexes):
+    decoded = GameState.deserialize(GameState.serialize(gamestate, binary=True))
+    play(gamestate, 20, seed=1)
+    play(decoded, 20, seed=1)
+    assert codec.encode(decoded) == codec.encode(gamestate)
+    assert indexes(decoded) == indexes(gamestate)
+
+
+def test_pickle_round_trip(gamestate):
+    decoded = GameState.deserialize(GameState.serialize(gamestate))
+    assert codec.encode(decoded) == codec.encode(gamestate)
+
+
+def test_records_compressed(gamestate):
+    game, records = codec.encode_parts(gamestate)
+    data = codec.encode(gamestate)
+    assert zlib.decompress(data[codec.HEADER.size + codec.GAME.size:]) == records
+    assert len(data) < codec.HEADER.size + len(game) + len(records)
+
+
+def test_snapshot_round_trip(gamestate):
+    snapshot = Snapshot.from_gamestate(gamestate)
+    assert snapshot.encode() == codec.encode(gamestate)
+    assert Snapshot.from_encoded(snapshot.encode()).records == snapshot.records
+
+
+def test_bad_magic():
+    data = codec.encode(GameState())
+    with pytest.raises(ValueError):
+        codec.decode(b'NOPE!' + data[5:], GameState)
+    with pytest.raises(ValueError):
+        codec.decode(b'', GameState)
+
+
+def test_bad_version():
+    data = codec.encode(GameState())
+    for version in (0, codec.VERSION + 1):
+        with pytest.raises(ValueError):
+            codec.decode(codec.HEADER.pack(codec.MAGIC, version) + data[codec.HEADER.size:], GameState)
+
+
+def test_truncated_or_corrupt():
+    data = codec.encode(GameState())
+    for broken in (data[:codec.HEADER.size + 3], data[:-4], data[:-4] + b'\0\0\0\0'):
+        with pytest.raises(ValueError):
+            codec.decode(broken, GameState)
+
+
+def test_history_replays(new_game, play):
+    '''a keyframe and the deltas of the turns since replay to the same state'''
+    gamestate = new_game()
+    keyframe = codec.encode(gamestate)
+    previous, deltas = Snapshot.from_gamestate(gamestate), []
+    for seed in range(5):
+        play(gamestate, 3, seed=seed)
+        snapshot = Snapshot.from_gamestate(gamestate)
+        deltas.append(previous.delta_to(snapshot))
+        previous = snapshot
+    assert replay(keyframe, deltas).encode() == codec.encode(gamestate)
@@ -0,0 +1,112 @@
+import io
+
+import pytest
+
+from mobai.engine.replay import Replay, ReplayWriter
+from mobai.tournament.bots import BOTS
+
+numpy = pytest.importorskip('numpy')
+
+from mobai.engine.dataset import Dataset, DatasetWriter, action_row, export_replay  # noqa: E402
+
+
+def play_turns(gamestate, turns, *writers):
+    '''turns of rushers, each added to `(writer, game)` pairs or replay writers, returns the expected rows'''
+    observations, actions = [], []
+    for _ in range(turns):
+        accepted = []
+        for player in (gamestate.player0, gamestate.player1):
+            commands = BOTS['rusher'](gamestate.state_for_player(player))
+            accepted.append(gamestate.commands_from_player(player, commands)['actions'])
+            observations.append((gamestate.turn, player.id, gamestate.map.to_planes(player)))
+            actions.extend(action_row(0, gamestate.turn, player.id, command) for command in accepted[-1])
+        for writer in writers:
+            if isinstance(writer, ReplayWriter):
+                writer.add_turn(gamestate, *accepted)
+            else:
+                writer[0].add_turn(writer[1], gamestate, *accepted)
+        gamestate.evaluate_turn()
+        gamestate.begin_turn()
+        for writer in writers:
+            if isinstance(writer, ReplayWriter):
+                writer.begin_turn(gamestate)
+    return observations, actions
+
+
+def rows(dataset, game):
+    '''observation rows (turn, player, planes, outcome) and action rows of a game, over all shards'''
+    observations, actions = [], []
+    for shard in dataset:
+        shard_observations, shard_actions = shard['observations'], shard['actions']
+        for index in numpy.flatnonzero(shard_observations['game'] == game):
+            observations.append((int(shard_observations['turn'][index]), int(shard_observations['player'][index]),
+                                 shard_observations['planes'][index], int(shard_observations['outcome'][index])))
+        for index in numpy.flatnonzero(shard_actions['game'] == game):
+            actions.append(tuple(int(shard_actions[column][index]) for column in (
+                'game', 'turn', 'player', 'unit', 'action', 'target_kind', 'target_unit', 'target_x', 'target_y')))
+    return observations, actions
+
+
+def assert_rows(dataset, game, expected, outcome):
+    observations, actions = rows(dataset, game)
+    expected_observations, expected_actions = expected
+    assert [row[:2] for row in observations] == [row[:2] for row in expected_observations]
+    for row, expected_row in zip(observations, expected_observations):
+        assert numpy.array_equal(row[2], expected_row[2])
+        assert row[3] == outcome(row[1])
+    assert actions == [(game,) + row[1:] for row in expected_actions]
+
+
+def test_shards_round_trip(tmp_path, new_game):
+    '''games are split over shards as they end, rows read back as written'''
+    directory = str(tmp_path / 'dataset')
+    writer = DatasetWriter(directory, shard_size=30)
+    unfinished, finished = new_game(), new_game()
+    games = writer.begin_game(), writer.begin_game()
+    expected_unfinished = play_turns(unfinished, 20, (writer, games[0]))
+    expected_finished = play_turns(finished, 10, (writer, games[1]))
+    for unit in finished.map.get_all_units(by_player=finished.player1):  # player0 won
+        unit.health = 0
+        unit._tile.remove_dead_units()
+    writer.end_game(games[0], unfinished)  # a shard of 40 rows
+    writer.end_game(games[1], finished)
+    writer.close()  # the last, partial shard
+
+    dataset = Dataset(directory)
+    assert len(dataset) == 60
+    assert [shard['observations'] for shard in dataset.metadata['shards']] == [40, 20]
+    assert dataset.metadata['plane_shape'] == list(expected_unfinished[0][0][2].shape)
+    assert_rows(dataset, games[0], expected_unfinished, lambda player_id: 0)
+    assert_rows(dataset, games[1], expected_finished, lambda player_id: 1 if player_id == 0 else -1)
+
+
+def test_writers_append(tmp_path, new_game):
+    '''games written later get new numbers and shards, running games are dropped on close'''
+    directory = str(tmp_path / 'dataset')
+    expected = []
+    for _ in range(2):
+        writer = DatasetWriter(directory)
+        game = writer.begin_game()
+        writer.begin_game()  # never ended
+        gamestate = new_game()
+        expected.append(play_turns(gamestate, 5, (writer, game)))
+        writer.end_game(game, gamestate)
+        writer.close()
+    dataset = Dataset(directory)
+    assert dataset.metadata['games'] == 4
+    assert len(dataset.metadata['shards']) == 2
+    assert_rows(dataset, 0, expected[0], lambda player_id: 0)
+    assert_rows(dataset, 2, expected[1], lambda player_id: 0)
+    assert rows(dataset, 1) == rows(dataset, 3) == ([], [])
+
+
+def test_export_replay(tmp_path, new_game):
+    gamestate = new_game()
+    fileobj = io.BytesIO()
+    replay_writer = ReplayWriter(fileobj, gamestate, keyframe_interval=4)
+    expected = play_turns(gamestate, 10, replay_writer)
+    replay_writer.close()
+    writer = DatasetWriter(str(tmp_path / 'dataset'))
+    assert export_replay(Replay(fileobj), writer) == 0
+    writer.close()
+    assert_rows(Dataset(str(tmp_path / 'dataset')), 0, expected, lambda player_id: 0)
@@ -0,0 +1,50 @@
+from mobai.engine import codec
+
+
+def test_fork_is_a_copy(gamestate, indexes):
+    forked = gamestate.fork()
+    assert codec.encode(forked) == codec.encode(gamestate)
+    assert indexes(forked) == indexes(gamestate)
+    assert forked.hash == gamestate.hash
+
+
+def test_fork_is_independent(gamestate, play, indexes):
+    before = codec.encode(gamestate)
+    forked = gamestate.fork()
+    play(forked, 20, seed=1)
+    assert codec.encode(gamestate) == before
+    play(gamestate, 20, seed=1)
+    assert codec.encode(forked) == codec.encode(gamestate)
+    assert indexes(forked) == indexes(gamestate)
+
+
+def test_undo_restores_the_checkpoint(gamestate, play, indexes):
+    '''units moved, spawned and died since the checkpoint, undo brings back
+    the state, its indexes and hash
+    '''
+    before, before_indexes, before_hash = codec.encode(gamestate), indexes(gamestate), gamestate.hash
+    gamestate.checkpoint()
+    play(gamestate, 20, seed=1)
+    assert gamestate.hash != before_hash
+    gamestate.undo()
+    assert codec.encode(gamestate) == before
+    assert indexes(gamestate) == before_indexes
+    assert gamestate.hash == before_hash
+
+
+def test_undo_nested_checkpoints(gamestate, play, indexes):
+    '''checkpoints are reverted last first, the game plays on as if never left'''
+    forked = gamestate.fork()
+    gamestate.checkpoint()
+    play(gamestate, 5, seed=1)
+    middle, middle_hash = codec.encode(gamestate), gamestate.hash
+    gamestate.checkpoint()
+    play(gamestate, 5, seed=2)
+    gamestate.undo()
+    assert codec.encode(gamestate) == middle and gamestate.hash == middle_hash
+    gamestate.undo()
+    play(gamestate, 10, seed=3)
+    play(forked, 10, seed=3)
+    assert codec.encode(gamestate) == codec.encode(forked)
+    assert indexes(gamestate) == indexes(forked)
+    assert gamestate.hash == forked.hash
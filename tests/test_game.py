@@ -0,0 +1,67 @@
+from mobai.engine.game import CommandError, GameState
+from mobai.engine.unit import Soldier
+from mobai.tournament.bots import BOTS
+
+
+def test_spawned_units_take_part(mode):
+    '''units read between `evaluate_turn` and `begin_turn` are read again
+    once spawning, spawned soldiers get their action points and commands
+    '''
+    gamestate = GameState(**mode)
+    gamestate.begin_turn()
+    for _ in range(gamestate.spawn_interval):
+        gamestate.evaluate_turn()
+        before = gamestate.all_units
+        gamestate.begin_turn()
+    units = gamestate.map.get_all_units()
+    assert len(units) == len(before) + 3 * len(gamestate.map.get_forts())
+    assert [unit.id for unit in gamestate.all_units] == [unit.id for unit in units]
+    newest = max(units, key=lambda unit: unit.id)
+    assert newest.action_points == 1
+    command = {'id': str(newest.id), 'action': 'stop'}
+    assert gamestate.commands_from_player(newest.player, [command]) == dict(actions=[command], errors=[])
+
+
+def test_sparse_state_has_the_tiles_of_the_map(gamestate):
+    for player in (gamestate.player0, gamestate.player1):
+        state, sparse = gamestate.state_for_player(player), gamestate.state_for_player(player, sparse=True)
+        assert sparse['tiles'] == [tile for row in state['map'] for tile in row if tile is not None]
+        assert len(sparse['tiles']) == len(gamestate.map.vision.visible(player))
+        assert (sparse['player_id'], sparse['turn']) == (state['player_id'], state['turn'])
+        for name, bot in sorted(BOTS.items()):
+            assert bot(sparse) == bot(state)
+
+
+def test_command_errors():
+    '''every rejected command is returned with its reason, the rest applied'''
+    gamestate = GameState()
+    gamestate.begin_turn()
+    player = gamestate.player0
+    soldier = Soldier(player, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(14, 0).add_unit(soldier)
+    own, enemy = str(soldier.id), Soldier(gamestate.player1, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(16, 0).add_unit(enemy)
+    hidden = Soldier(gamestate.player1, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(30, 0).add_unit(hidden)
+    fort = str(gamestate.map.get_forts(player)[0].id)
+    gamestate.begin_turn()  # commands are validated against the units of the turn
+    target = dict(id=own, action='target', target=str(enemy.id))
+    cases = [
+        ('malformed', ['stop']), ('malformed', None), ('malformed', 'stop'),
+        ('malformed', {'action': 'stop'}), ('malformed', {'id': own}), ('malformed', {'id': own, 'action': ['stop']}),
+        ('malformed', {'id': own, 'action': 'dance'}), ('malformed', {'id': own, 'action': 'target'}),
+        ('malformed', {'id': own, 'action': 'target', 'target': {'posx': 15}}),
+        ('unknown_unit', {'id': '999', 'action': 'stop'}), ('unknown_unit', {'id': 'x', 'action': 'stop'}),
+        ('not_owned', {'id': str(enemy.id), 'action': 'stop'}),
+        ('unknown_target', dict(target, target='999')),
+        ('own_target', dict(target, target=fort)),
+        ('not_mobile', {'id': fort, 'action': 'target', 'target': {'posx': 15, 'posy': 0}}),
+        ('invalid_position', dict(target, target={'posx': 15, 'posy': 5})),
+        ('no_vision', dict(target, target=str(hidden.id))),
+    ]
+    assert sorted({reason for reason, _ in cases}) == sorted(CommandError.__members__)
+    commands = [command for _, command in cases] + [target]
+    result = gamestate.commands_from_player(player, commands)
+    assert result['errors'] == [dict(command=command, reason=reason) for reason, command in cases]
+    assert result['actions'] == [target]
+    assert soldier.target == enemy
@@ -0,0 +1,57 @@
+import io
+import random
+
+import pytest
+
+from mobai.engine import codec
+from mobai.engine.replay import Replay, ReplayWriter
+from mobai.tournament.bots import BOTS
+
+
+def record(gamestate, turns, keyframe_interval):
+    '''a replay of turns played by rushers, and the encoded state of every turn'''
+    fileobj = io.BytesIO()
+    writer = ReplayWriter(fileobj, gamestate, keyframe_interval=keyframe_interval)
+    states = {gamestate.turn: codec.encode(gamestate)}
+    for _ in range(turns):
+        actions = [gamestate.commands_from_player(player, BOTS['rusher'](gamestate.state_for_player(player)))['actions']
+                   for player in (gamestate.player0, gamestate.player1)]
+        writer.add_turn(gamestate, *actions)
+        gamestate.evaluate_turn()
+        gamestate.begin_turn()
+        writer.begin_turn(gamestate)
+        states[gamestate.turn] = codec.encode(gamestate)
+    writer.close()
+    return fileobj, states
+
+
+@pytest.fixture
+def recorded(new_game, play):
+    '''a game recorded from turn 10 to 70, keyframes every 7 turns'''
+    return record(play(new_game(), 10), 60, 7)
+
+
+def test_seeking_reaches_every_turn(recorded):
+    fileobj, states = recorded
+    replay = Replay(fileobj)
+    assert (replay.first_turn, replay.turns) == (10, 60)
+    assert [turn for turn, _ in replay.keyframes] == [10, 14, 21, 28, 35, 42, 49, 56, 63, 70]
+    turns = sorted(states)
+    random.Random(0).shuffle(turns)
+    for turn in turns:
+        assert codec.encode(replay.state(turn)) == states[turn]
+    with pytest.raises(AssertionError):
+        replay.state(71)
+
+
+def test_iterating_plays_all_turns(recorded):
+    fileobj, states = recorded
+    assert [codec.encode(gamestate) for gamestate in Replay(fileobj)] == [states[turn] for turn in sorted(states)]
+
+
+def test_not_a_replay(recorded):
+    fileobj, _ = recorded
+    with pytest.raises(ValueError):
+        Replay(io.BytesIO(b'\0' + fileobj.getvalue()[1:]))
+    with pytest.raises(ValueError):
+        Replay(io.BytesIO(fileobj.getvalue()[:-1]))  # no index
@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from mobai.engine.map import Map
+from mobai.engine.routing import RoutingTable, routing_table
+from mobai.engine.topology import GENERATED, LANES, Topology
+from mobai.engine.util import a_star_search
+
+TOPOLOGIES = {
+    'lanes': (LANES, 36, 21, 0, 0),
+    'large_lanes': (LANES, 78, 45, 0, 0),
+    'generated': (GENERATED, 60, 31, 1, 6),
+}
+
+
+@pytest.fixture(params=sorted(TOPOLOGIES))
+def topology(request):
+    return Topology.build(*TOPOLOGIES[request.param])
+
+
+def pairs(topology, count=300, seed=0):
+    rng = random.Random(seed)
+    return [(rng.choice(topology.positions), rng.choice(topology.positions)) for _ in range(count)]
+
+
+def assert_shortest(_map, start, end, path):
+    '''path is a walk over neighbors from start to end, as short as the one A* finds'''
+    assert len(path) == len(list(a_star_search(_map, start, end))) if start != end else not path
+    for position, next_position in zip([start] + path, path):
+        assert next_position in _map.topology.neighbors[position]
+    assert not path or path[-1] == end
+
+
+def test_paths_match_a_star_search(topology):
+    '''on lanes the paths are the ones A* finds, elsewhere they are as short'''
+    _map = Map(topology=topology)
+    for start, end in pairs(topology):
+        path = _map.shortest_path(start, end)
+        if topology.kind == LANES and start != end:
+            assert path == list(a_star_search(_map, start, end))
+        assert_shortest(_map, start, end, path)
+
+
+def test_paths_do_not_depend_on_order(topology):
+    queries = pairs(topology, count=100)
+    _map = Map(topology=topology)
+    paths = {query: routing_table(_map).path(*query) for query in queries}
+    random.Random(1).shuffle(queries)
+    table = RoutingTable(_map)
+    assert {query: table.path(*query) for query in queries} == paths
+
+
+def test_evicted_fields_are_searched_again(topology, monkeypatch):
+    '''the tables only keep the fields and distances used last, to the same paths'''
+    monkeypatch.setattr(RoutingTable, 'max_fields', 4)
+    monkeypatch.setattr(RoutingTable, 'max_distances', 2)
+    _map = Map(topology=topology)
+    expected = {query: RoutingTable(_map).path(*query) for query in pairs(topology, count=50)}
+    table = RoutingTable(_map)
+    for query, path in expected.items():
+        assert table.path(*query) == path
+        assert len(table.next_hop) <= 4 and len(table._distances) <= 2
+
+
+def test_tables_belong_to_the_topology():
+    lanes = Topology.build(LANES, 36, 21)
+    assert routing_table(Map(topology=lanes)) is routing_table(Map(topology=lanes))
+    assert routing_table(Map(topology=Topology.lanes())) is not routing_table(Map(topology=lanes))
@@ -0,0 +1,84 @@
+'''Gameplay rules of docs/rules_and_concepts.md, on soldiers placed on the
+top lane of the default map, away from the buildings.
+'''
+import pytest
+
+from mobai.engine.game import GameState
+from mobai.engine.unit import Soldier
+
+
+@pytest.fixture
+def game(mode):
+    return GameState(**mode)
+
+
+def soldier(gamestate, player, x, y=0):
+    unit = Soldier(player, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(x, y).add_unit(unit)
+    return unit
+
+
+def end_turn(gamestate):
+    gamestate.evaluate_turn()
+    gamestate.begin_turn()
+
+
+def test_units_are_only_equal_to_units(game):
+    unit = soldier(game, game.player0, 14)
+    assert unit == game.map.get_tile(14, 0).occupants[0]
+    assert unit != soldier(game, game.player0, 14)
+    assert unit != None  # noqa: E711
+    assert unit != game.map.get_tile(14, 0)
+
+
+def test_dead_units_are_removed_with_tile_targets_around(game):
+    '''targets of other units (tiles, none) are compared against the dead'''
+    walking = soldier(game, game.player0, 14)
+    walking.set_target(game.map.get_tile(17, 0))
+    soldier(game, game.player0, 15)
+    dead = soldier(game, game.player1, 20)
+    dead.health = 0
+    end_turn(game)
+    assert dead.id not in game.map.registry.units
+    assert (walking.x, walking.y) == (15, 0)
+    assert walking.target == game.map.get_tile(17, 0)
+
+
+def test_attack_target(game):
+    attacker, target = soldier(game, game.player0, 15), soldier(game, game.player1, 16)
+    attacker.set_target(target)
+    attacker.attack_target()
+    assert target.health == 3 - attacker.attack
+    assert attacker.action_points == 0
+
+
+def test_attacks_are_resolved(game):
+    attacker, target = soldier(game, game.player0, 15), soldier(game, game.player1, 16)
+    attacker.set_target(target)
+    end_turn(game)
+    assert target.health == 3 - attacker.attack
+    assert (attacker.x, attacker.y) == (15, 0)  # attacked instead of moving
+
+
+def test_chasing_keeps_the_unit_target(game):
+    chaser, runner = soldier(game, game.player0, 14), soldier(game, game.player1, 16)
+    chaser.set_target(runner)
+    assert chaser.target == runner
+    assert chaser.path[-1] == runner._tile
+    runner.set_target(game.map.get_tile(19, 0))
+    end_turn(game)
+    assert (chaser.x, chaser.y) == (15, 0) and (runner.x, runner.y) == (17, 0)
+    assert chaser.target == runner
+    assert chaser.path[-1] == runner._tile
+
+
+def test_targeting_own_tile_stops(game):
+    unit = soldier(game, game.player0, 14)
+    unit.set_target(game.map.get_tile(20, 0))
+    end_turn(game)
+    assert (unit.x, unit.y) == (15, 0) and unit.path
+    unit.set_target(unit._tile)
+    assert not unit.path
+    assert unit.target is None
+    end_turn(game)
+    assert (unit.x, unit.y) == (15, 0)
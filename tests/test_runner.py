@@ -0,0 +1,161 @@
+import io
+import queue
+
+import pytest
+
+pytest.importorskip('pymongo')
+mongomock = pytest.importorskip('mongomock')
+
+from bson.objectid import ObjectId  # noqa: E402
+
+from mobai.engine.game import GameState  # noqa: E402
+from mobai.engine.replay import Replay  # noqa: E402
+from mobai.server import runner  # noqa: E402
+from mobai.server.utils import play_turn  # noqa: E402
+from mobai.tournament.bots import BOTS  # noqa: E402
+
+
+class Stop(Exception):
+    pass
+
+
+class BoundedRunner(runner.Runner):
+    '''stops once its game reaches `stop_turn` and the writes are done'''
+    stop_turn = None
+
+    def wait_for_commands(self, gamestate):
+        if gamestate.turn >= self.stop_turn:
+            self.writer.flush()
+            raise Stop()
+        return super(BoundedRunner, self).wait_for_commands(gamestate)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient().mobai
+    for name in ('games', 'commands', 'turns'):
+        monkeypatch.setattr(runner, name, getattr(database, name))
+    return database
+
+
+def posted_commands(turns):
+    '''commands of rushers posted for turns, as `{'turn', 'player_id',
+    'commands'}` messages, and the hashes of the states they lead to by turn
+    '''
+    gamestate, messages, hashes = GameState(), [], {}
+    gamestate.begin_turn()
+    for turn in range(turns):
+        hashes[turn] = gamestate.hash
+        turn_commands = []
+        for player in (gamestate.player0, gamestate.player1):
+            turn_commands.append(BOTS['rusher'](gamestate.state_for_player(player)))
+            messages.append({'turn': turn, 'player_id': player.id, 'commands': turn_commands[-1]})
+        play_turn(gamestate, *turn_commands)
+    hashes[turns] = gamestate.hash
+    return messages, hashes
+
+
+@pytest.fixture
+def game(db):
+    '''a new game with the commands of its first 40 turns posted, and the
+    hashes of the states they lead to by turn
+    '''
+    game_oid = db.games.insert_one({'status': 'new', 'turn': 0}).inserted_id
+    messages, hashes = posted_commands(40)
+    for message in messages:
+        db.commands.insert_one(dict(message, game=game_oid))
+    return game_oid, hashes
+
+
+def run(game_oid, turn, **kwargs):
+    game_runner = BoundedRunner(str(game_oid), **kwargs)
+    game_runner.stop_turn = turn
+    with pytest.raises(Stop):
+        game_runner.run()
+    return game_runner
+
+
+def test_keyframes_and_deltas(db, game):
+    '''every turn is saved, a keyframe every `keyframe_interval` turns and deltas in between'''
+    game_oid, hashes = game
+    game_runner = run(game_oid, 25)
+    assert db.games.find_one(game_oid)['turn'] == 25
+    saved = {doc['turn']: doc for doc in db.turns.find({'game': game_oid})}
+    assert sorted(saved) == list(range(26))
+    assert sorted(turn for turn, doc in saved.items() if 'keyframe' in doc) == [0, 10, 20]
+    assert all('delta' in doc for turn, doc in saved.items() if turn % 10)
+    for turn in range(26):
+        assert game_runner.get_gamestate(turn).hash == hashes[turn]
+
+
+def test_resume(db, game):
+    '''with turns saved every few turns, a runner resumes from the last saved
+    one and plays the turns since again from their commands
+    '''
+    game_oid, hashes = game
+    run(game_oid, 14, persist_interval=3)
+    assert sorted(doc['turn'] for doc in db.turns.find({'game': game_oid})) == [0, 3, 6, 9, 12]
+    game_runner = runner.Runner(str(game_oid), persist_interval=3)
+    assert game_runner.resume().hash == hashes[14]
+    for turn in (4, 11, 13):
+        assert game_runner.get_gamestate(turn).hash == hashes[turn]
+    gamestate = game_runner.get_gamestate(turn=5)
+    game_runner.play_to(gamestate, 9)
+    assert gamestate.hash == hashes[9]
+
+    run(game_oid, 30, persist_interval=3)  # plays on where it was
+    assert runner.Runner(str(game_oid)).resume().hash == hashes[30]
+
+
+def test_resume_after_going_down_before_updating_the_game(db, game):
+    game_oid, hashes = game
+    run(game_oid, 12)
+    db.games.update_one({'_id': game_oid}, {'$set': {'turn': 11}})  # turn 12 saved, the game not updated
+    game_runner = runner.Runner(str(game_oid))
+    assert game_runner.resume().hash == hashes[12]
+    game_runner.writer.flush()
+    assert db.games.find_one(game_oid)['turn'] == 12
+
+
+def test_save_replay(db, game, monkeypatch):
+    '''a finished game is replayed from its commands, read at once'''
+    game_oid, hashes = game
+    run(game_oid, 40, persist_interval=7)
+    db.games.update_one({'_id': game_oid}, {'$set': {'status': 'finished'}})
+    monkeypatch.setattr(db.commands, 'find_one', None)  # not turn by turn
+    runner.Runner(str(game_oid)).run()
+    replay = Replay(io.BytesIO(db.games.find_one(game_oid)['replay']))
+    assert (replay.first_turn, replay.turns) == (0, 40)
+    for turn in (0, 1, 17, 39, 40):
+        assert replay.state(turn).hash == hashes[turn]
+
+
+def test_commands_announced_on_the_inbox(db, monkeypatch):
+    '''commands are taken from the inbox as they're announced, messages of
+    other turns are skipped
+    '''
+    monkeypatch.setattr(runner.Runner, 'resync_interval', 10)
+    monkeypatch.setattr(db.commands, 'find_one', lambda *args, **kwargs: None)  # only looked up on start
+    game_oid = db.games.insert_one({'status': 'new', 'turn': 0}).inserted_id
+    messages, hashes = posted_commands(10)
+    inbox = queue.Queue()
+    for message in messages:
+        inbox.put(message)
+        inbox.put(dict(message, turn=message['turn'] - 1, commands=[]))  # late, eg. announced twice
+    run(game_oid, 10, inbox=inbox)
+    assert runner.Runner(str(game_oid)).resume().hash == hashes[10]
+
+
+def test_commands_looked_up_without_announcement(db, game, monkeypatch):
+    '''commands saved but never announced are found once nothing comes in
+    for `resync_interval`, eg. posted to another server
+    '''
+    monkeypatch.setattr(runner.Runner, 'resync_interval', 0.01)
+    game_oid, hashes = game
+    run(game_oid, 10, inbox=queue.Queue())
+    assert runner.Runner(str(game_oid)).resume().hash == hashes[10]
+
+
+def test_unknown_game(db):
+    with pytest.raises(TypeError):
+        runner.Runner(str(ObjectId()))
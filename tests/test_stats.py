@@ -0,0 +1,71 @@
+from mobai.engine import codec, game
+from mobai.engine.game import GameState
+from mobai.engine.routing import routing_table
+from mobai.engine.stats import GameStats
+from mobai.tournament.bots import BOTS
+
+PHASES = ('attack', 'move', 'chase', 'finish', 'remove_dead_units', 'commands_from_player', 'begin_turn')
+
+
+def play(gamestate, turns):
+    '''rushers on both sides, returns (commands, errors, dead units) counted along'''
+    commands = errors = dead = 0
+    for _ in range(turns):
+        for player in (gamestate.player0, gamestate.player1):
+            result = gamestate.commands_from_player(player, BOTS['rusher'](gamestate.state_for_player(player)))
+            commands, errors = commands + len(result['actions']), errors + len(result['errors'])
+        alive = set(gamestate.map.registry.units)
+        gamestate.evaluate_turn()
+        dead += len(alive - set(gamestate.map.registry.units))
+        gamestate.begin_turn()
+    return commands, errors, dead
+
+
+def test_counts(mode):
+    turns = []
+    stats = GameStats(sink=turns.append)
+    gamestate = GameState(stats=stats, **mode)
+    table = routing_table(gamestate.map)  # shared by games of the map size, searches of other games counted too
+    searches, nodes = table.searches, table.nodes
+    gamestate.begin_turn()
+    commands, errors, dead = play(gamestate, 60)
+
+    assert stats.calls == dict(dict.fromkeys(PHASES, 60), begin_turn=61, commands_from_player=120)
+    assert set(stats.times) == set(PHASES)
+    assert (stats.counters['commands'], stats.counters['errors'], stats.counters['dead_units']) == (
+        commands, errors, dead)
+    assert commands and dead
+    assert (stats.counters['path_searches'], stats.counters['path_nodes']) == (
+        table.searches - searches, table.nodes - nodes)
+    assert stats.counters['vision_positions'] >= stats.counters['vision_updates'] > 0
+    # values of each turn, the last begin_turn is yet to be passed on with its turn
+    assert [turn['turn'] for turn in turns] == list(range(60))
+    for name, total in stats.counters.items():
+        assert sum(turn['counters'].get(name, 0) for turn in turns) + stats.turn_counters.get(name, 0) == total
+    assert stats.as_dict() == dict(times=stats.times, calls=stats.calls, counters=stats.counters)
+
+
+def test_stats_change_nothing(mode):
+    '''enabled or not, stopped halfway, the game plays the same'''
+    plain, instrumented = GameState(**mode), GameState(stats=GameStats(), **mode)
+    for gamestate in (plain, instrumented):
+        gamestate.begin_turn()
+        play(gamestate, 30)
+    instrumented.set_stats(None)
+    for gamestate in (plain, instrumented):
+        play(gamestate, 30)
+    assert codec.encode(instrumented) == codec.encode(plain)
+
+
+def test_disabled_stats_cost_nothing(mode, monkeypatch):
+    '''without stats nothing is timed or counted'''
+    def called(*args, **kwargs):
+        raise AssertionError('stats are disabled')
+
+    for name in ('add_time', 'count', 'end_turn'):
+        monkeypatch.setattr(GameStats, name, called)
+    monkeypatch.setattr(GameState, '_phase_start', called)
+    monkeypatch.setattr(game.time, 'perf_counter', called)
+    gamestate = GameState(**mode)
+    gamestate.begin_turn()
+    play(gamestate, 60)
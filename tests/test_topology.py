@@ -0,0 +1,70 @@
+import pickle
+
+import pytest
+
+from mobai.engine import codec
+from mobai.engine.game import GameState
+from mobai.engine.topology import CUSTOM, GENERATED, LANES, Topology, _topologies
+
+
+def custom(size_x=36, size_y=21):
+    '''the lanes of `Topology.lanes` without the middle row'''
+    lanes = Topology.lanes(size_x, size_y)
+    positions = [(x, y) for x, y in lanes.positions if y != size_y // 2 or x in (0, size_x - 1)]
+    buildings = [pos for pos in lanes.building_positions if pos[1] != size_y // 2 or pos in lanes.fort_positions]
+    return Topology(size_x, size_y, positions, buildings, set(lanes.fort_positions))
+
+
+def test_keys():
+    topology = custom()
+    assert topology.kind == CUSTOM
+    assert topology.key != Topology.build(LANES, 36, 21).key
+    assert custom().key == topology.key
+    assert custom(43, 25).key != topology.key
+    assert Topology.lanes().key == Topology.build(LANES, 36, 21).key
+    assert Topology.generate(36, 21, seed=1).key == Topology.build(GENERATED, 36, 21, seed=1, spacing=6).key
+    with pytest.raises(ValueError):
+        Topology.build(CUSTOM, 36, 21)
+
+
+def test_rebuildable():
+    assert Topology.build(LANES, 36, 21).rebuildable()
+    assert Topology.lanes().rebuildable()
+    assert Topology.generate(36, 21, seed=1).rebuildable()
+    assert not custom().rebuildable()
+
+
+def test_pickle_custom():
+    topology = custom()
+    unpickled = pickle.loads(pickle.dumps(topology))
+    assert unpickled.key == topology.key
+    assert unpickled.positions == topology.positions
+    assert unpickled.building_positions == topology.building_positions
+    assert unpickled.fort_positions == topology.fort_positions
+    assert pickle.loads(pickle.dumps(topology)) is unpickled
+
+
+def test_game_on_custom_topology(new_game, play):
+    gamestate = play(new_game(topology=custom()), 30)
+    for other in (GameState.deserialize(GameState.serialize(gamestate)), gamestate.fork()):
+        assert other.map.topology.positions == gamestate.map.topology.positions
+        assert other.map.to_array() == gamestate.map.to_array()
+        play(other, 10, seed=1)
+    with pytest.raises(ValueError):
+        codec.encode(gamestate)
+
+
+def test_shared_topologies_are_bounded(monkeypatch):
+    '''the topologies used last are shared, evicted ones are built again'''
+    monkeypatch.setattr(Topology, 'max_shared', 2)
+    lanes = Topology.build(LANES, 36, 21)
+    generated = Topology.build(GENERATED, 36, 21, seed=1, spacing=6)
+    assert Topology.build(LANES, 36, 21) is lanes  # now used last
+    assert len(_topologies) <= 2
+    Topology.build(LANES, 43, 25)
+    assert Topology.build(LANES, 36, 21) is lanes
+    assert len(_topologies) <= 2
+    rebuilt = Topology.build(GENERATED, 36, 21, seed=1, spacing=6)
+    assert rebuilt is not generated and rebuilt.positions == generated.positions
+    assert pickle.loads(pickle.dumps(custom())) is pickle.loads(pickle.dumps(custom()))
+    assert len(_topologies) <= 2
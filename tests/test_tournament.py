@@ -0,0 +1,43 @@
+import io
+import json
+
+import pytest
+
+pytest.importorskip('click')
+
+from mobai.tournament.bots import rusher  # noqa: E402
+from mobai.tournament.runner import Tournament, load_bot, play_game, schedule  # noqa: E402
+
+
+def test_schedule_alternates_sides():
+    games = list(schedule(['idle', 'rusher', 'defender'], 2, 50))
+    assert [game['game'] for game in games] == list(range(6))
+    assert [game['bots'] for game in games[:2]] == [('idle', 'rusher'), ('rusher', 'idle')]
+    assert {frozenset(game['bots']) for game in games} == {
+        frozenset(pairing) for pairing in [('idle', 'rusher'), ('idle', 'defender'), ('rusher', 'defender')]}
+
+
+def test_load_bot():
+    assert load_bot('rusher') is rusher
+    assert load_bot('mobai.tournament.bots:rusher') is rusher
+    with pytest.raises(AssertionError):
+        load_bot('unknown')
+
+
+def test_play_game_stops_at_max_turns():
+    result = play_game(dict(game=3, bots=('idle', 'defender'), max_turns=20, gamestate={'map_size': (22, 13)}))
+    assert (result['game'], result['bots'], result['winner'], result['turns']) == (3, ('idle', 'defender'), None, 20)
+    assert result['engine_seconds'] + sum(result['bot_seconds']) == pytest.approx(result['seconds'])
+
+
+def test_tournament_results():
+    '''a json line per game, a rusher beats a bot that does nothing from
+    either side, wins are counted by bot
+    '''
+    output = io.StringIO()
+    wins = Tournament(['rusher', 'idle'], games=2, max_turns=1000, processes=2).run(output)
+    results = sorted((json.loads(line) for line in output.getvalue().splitlines()), key=lambda result: result['game'])
+    assert [(result['bots'], result['winner']) for result in results] == [
+        (['rusher', 'idle'], 0), (['idle', 'rusher'], 1)]
+    assert all(result['turns'] < 1000 for result in results)
+    assert wins == {'rusher': 2, 'idle': 0}
@@ -0,0 +1,50 @@
+import pytest
+
+from mobai.engine import codec
+from mobai.engine.game import GameState
+from mobai.engine.vecenv import VectorEnv
+from mobai.tournament.bots import BOTS
+
+pytest.importorskip('numpy')
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_spawned_units_take_part(vectorized):
+    '''units spawned by `begin_turn` after a step are in the game's units and can be commanded'''
+    env = VectorEnv(2, vectorized=vectorized)
+    env.reset()
+    for _ in range(10):
+        env.step([([], [])] * 2)
+    for gamestate in env.games:
+        assert gamestate.turn == 10
+        units = gamestate.map.get_all_units()
+        assert [unit.id for unit in gamestate.all_units] == [unit.id for unit in units]
+        newest = max(units, key=lambda unit: unit.id)
+        assert newest.action_points == 1
+        command = {'id': str(newest.id), 'action': 'stop'}
+        result = gamestate.commands_from_player(newest.player, [command])
+        assert result == dict(actions=[command], errors=[])
+
+
+def test_turns_resolved_together(new_game, play):
+    '''games evaluated by one VectorizedTurn end up where evaluating them one by one does'''
+    games = [play(new_game(vectorized=True), turns, seed=seed) for seed, turns in enumerate((5, 25, 40))]
+    games.append(games[-1].fork())  # the same unit ids attacked at the same time
+    games.append(play(new_game(), 30))  # evaluated on its own
+    copies = [gamestate.fork() for gamestate in games]
+    for gamestate in games + copies:
+        assert gamestate.hash  # kept up to date from now on
+    for _ in range(30):
+        for gamestate, copy in zip(games, copies):
+            for player in (gamestate.player0, gamestate.player1):
+                commands = BOTS['rusher'](gamestate.state_for_player(player))
+                gamestate.commands_from_player(player, commands)
+                copy.commands_from_player(copy.players[player.id], commands)
+        GameState.evaluate_turns(games)
+        for gamestate, copy in zip(games, copies):
+            copy.evaluate_turn()
+            assert codec.encode(gamestate) == codec.encode(copy)
+            assert gamestate.hash == copy.hash
+            if not gamestate.finished:
+                gamestate.begin_turn()
+                copy.begin_turn()
@@ -0,0 +1,53 @@
+import logging
+
+import pytest
+
+from mobai.engine import codec
+from mobai.engine.game import GameState
+from mobai.engine.routing import Path
+from mobai.engine.unit import Soldier
+
+pytest.importorskip('numpy')
+
+
+def test_same_state_as_unit_by_unit(new_game, play):
+    '''vectorized turns end up where resolving them unit by unit does'''
+    plain, vectorized = new_game(), new_game(vectorized=True)
+    for seed in range(4):
+        play(plain, 20, seed=seed)
+        play(vectorized, 20, seed=seed)
+        assert vectorized.turn == plain.turn
+        assert codec.encode_parts(vectorized)[1] == codec.encode_parts(plain)[1]
+        assert vectorized.hash == plain.hash
+
+
+@pytest.mark.parametrize('vectorized', [False, True])
+def test_unreachable_path_is_dropped(vectorized, caplog):
+    gamestate = GameState(vectorized=vectorized)
+    soldier = Soldier(gamestate.player0, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(14, 0).add_unit(soldier)
+    soldier.path = Path(gamestate.map, (20, 0), (25, 0))
+    with caplog.at_level(logging.WARNING):
+        gamestate.evaluate_turn()
+    assert (soldier.x, soldier.y) == (14, 0)
+    assert not soldier.path
+    assert 'next tile in path of unit %d (Soldier) unreachable' % soldier.id in caplog.text
+
+
+def test_games_resolved_together_keep_their_hashes():
+    '''units of different games have the same ids, each is rehashed in its own game'''
+    games, copies = [], []
+    for _ in range(2):
+        gamestate = GameState(vectorized=True)
+        attacker = Soldier(gamestate.player0, gamestate.map.new_unit_id())
+        target = Soldier(gamestate.player1, gamestate.map.new_unit_id())
+        gamestate.map.get_tile(15, 0).add_unit(attacker)
+        gamestate.map.get_tile(16, 0).add_unit(target)
+        attacker.set_target(target)
+        assert gamestate.hash
+        games.append(gamestate)
+        copies.append(gamestate.fork())
+    GameState.evaluate_turns(games)
+    for gamestate, copy in zip(games, copies):
+        copy.evaluate_turn()
+        assert gamestate.hash == copy.hash
@@ -0,0 +1,65 @@
+import collections
+
+from mobai.engine.game import GameState
+from mobai.engine.unit import Soldier
+
+
+def recomputed(units):
+    '''coverage counted from scratch, player id -> {position: count}'''
+    coverage = collections.defaultdict(collections.Counter)
+    for unit in units:
+        coverage[unit.player.id].update(unit.visible_positions())
+    return {player_id: dict(counts) for player_id, counts in coverage.items()}
+
+
+def coverage(gamestate):
+    return {player_id: counts for player_id, counts in gamestate.map.vision.coverage.items() if counts}
+
+
+def test_coverage_of_a_new_game(mode):
+    gamestate = GameState(**mode)
+    assert coverage(gamestate) == recomputed(gamestate.map.get_all_units())
+
+
+def test_coverage_after_playing(gamestate):
+    '''units moved, spawned and died, coverage counts what they see now'''
+    assert coverage(gamestate) == recomputed(gamestate.map.get_all_units())
+    for player in (gamestate.player0, gamestate.player1):
+        assert gamestate.map.vision_by_player(player) == set(recomputed(gamestate.all_units).get(player.id, {}))
+
+
+def test_overlapping_units_are_counted(mode):
+    gamestate = GameState(**mode)
+    player = gamestate.player0
+    before = dict(gamestate.map.vision.visible(player))
+    tile = gamestate.map.get_tile(14, 0)
+    soldiers = [Soldier(player, gamestate.map.new_unit_id()) for _ in range(2)]
+    for soldier in soldiers:
+        tile.add_unit(soldier)
+    visible = gamestate.map.vision.visible(player)
+    for pos in soldiers[0].visible_positions():
+        assert visible[pos] == before.get(pos, 0) + 2
+
+    soldiers[0].health = 0
+    tile.remove_dead_units()
+    for pos in soldiers[1].visible_positions():
+        assert visible[pos] == before.get(pos, 0) + 1
+    soldiers[1].health = 0
+    tile.remove_dead_units()
+    assert gamestate.map.vision.visible(player) == before
+    assert coverage(gamestate) == recomputed(gamestate.map.get_all_units())
+
+
+def test_moving_unit_takes_its_vision_along(mode):
+    gamestate = GameState(**mode)
+    player = gamestate.player0
+    soldier = Soldier(player, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(14, 0).add_unit(soldier)
+    soldier.set_target(gamestate.map.get_tile(17, 0))
+    for _ in range(3):
+        gamestate.evaluate_turn()
+        gamestate.begin_turn()
+    assert (soldier.x, soldier.y) == (17, 0)
+    assert gamestate.map.player_has_vision(player, (19, 0))
+    assert not gamestate.map.player_has_vision(player, (13, 0))
+    assert coverage(gamestate) == recomputed(gamestate.map.get_all_units())
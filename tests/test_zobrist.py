@@ -0,0 +1,40 @@
+from mobai.engine.unit import Soldier
+from mobai.engine.zobrist import Zobrist
+
+
+def assert_recomputed(gamestate):
+    '''the hashes kept up to date are those of hashing the map from scratch'''
+    zobrist, recomputed = gamestate.map.zobrist, Zobrist(gamestate.map)
+    assert zobrist.value == recomputed.value
+    assert zobrist.parts == recomputed.parts
+    assert {pos: part for pos, part in zobrist.positions.items() if part} == \
+        {pos: part for pos, part in recomputed.positions.items() if part}
+    assert {player_id: zobrist.visible.get(player_id, 0) for player_id in recomputed.visible} == recomputed.visible
+
+
+def test_hash_follows_moves_and_deaths(mode, new_game, play):
+    gamestate = new_game(**mode)
+    assert gamestate.hash
+    seen, died = set(), set()
+    for turn in range(60):
+        play(gamestate, 1, seed=turn)
+        alive = set(gamestate.map.registry.units)
+        died |= seen - alive
+        seen |= alive
+        assert_recomputed(gamestate)
+    assert died  # some units did die on the way
+
+
+def test_hash_changes_with_a_unit(mode, new_game):
+    gamestate = new_game(**mode)
+    before, before_player1 = gamestate.hash, gamestate.hash_for_player(gamestate.player1)
+    soldier = Soldier(gamestate.player0, gamestate.map.new_unit_id())
+    gamestate.map.get_tile(14, 0).add_unit(soldier)
+    assert gamestate.hash != before
+    assert gamestate.hash_for_player(gamestate.player1) == before_player1  # out of player1's sight
+    soldier.health -= 1
+    assert_recomputed(gamestate)
+    soldier.health = 0
+    gamestate.map.get_tile(14, 0).remove_dead_units()
+    assert gamestate.hash == before
+    assert_recomputed(gamestate)